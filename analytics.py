@@ -0,0 +1,296 @@
+# file that analyses the results database with NumPy
+# The results are loaded once into a structured array and every statistic is computed
+# for all the formulations and sizes at the same time. Runs with options that are not the default ones are
+# taken as another formulation ('MTZ+warm_start', see configurations). Example:
+#   results = load_results('results.db')
+#   statistics = group_statistics(results, 'exec_time', time_limit = 600)
+#   plot_all(results)
+
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+from itertools import combinations
+from results_store import ResultsStore, CONFIGURATION, configuration_label
+from trajectory import primal_dual_integral
+
+OPTIMAL = 2 # Gurobi status of a problem solved to optimality
+
+# columns loaded from the database and their types
+FIELDS = [('formulation', 'U64'), ('instance', 'U256'), ('nodes', 'i8'), ('status', 'i8'),
+          ('obj_val', 'f8'), ('best_bound', 'f8'), ('gap', 'f8'), ('exec_time', 'f8'),
+          ('obj_val_relaxed', 'f8'), ('exec_time_relaxed', 'f8'), ('wall_time', 'f8'), ('wall_time_relaxed', 'f8'),
+          ('num_vars', 'f8'), ('num_constrs', 'f8'), ('num_nzs', 'f8'), ('time_env', 'f8'), ('time_init', 'f8'),
+          ('time_formulation', 'f8'), ('time_update', 'f8'), ('time_relax', 'f8'), ('peak_rss', 'f8'),
+          ('vectorized', 'i8'), ('warm_start', 'i8'), ('candidates', 'U16'), ('fix_arcs', 'i8'), ('trajectory_interval', 'f8'),
+          ('time_preprocess', 'f8'), ('time_cache', 'f8'), ('model_cached', 'i8')]
+
+BUILD_PHASES = ['time_env', 'time_init', 'time_formulation', 'time_update'] # see instrumentation.py
+
+def load_results(file_path = 'results.db'):
+    # returns a structured array with every run of the results database (missing values are NaN or -1)
+    with ResultsStore(file_path) as store:
+        rows = store.query([name for name, kind in FIELDS])
+    missing = {'i8': - 1, 'f8': np.nan}
+    rows = [tuple(missing.get(kind, '') if value is None else value for value, (name, kind) in zip(row, FIELDS)) for row in rows]
+    return np.array(rows, dtype = FIELDS)
+
+def optimal_values(results):
+    # returns, for every run, the best objective value found for its instance by any formulation
+    # (the optimum when some formulation solved the instance)
+    instances, inverse = np.unique(results['instance'], return_inverse = True)
+    best = np.full(len(instances), np.inf)
+    np.minimum.at(best, inverse, np.where(np.isnan(results['obj_val']), np.inf, results['obj_val']))
+    return np.where(np.isinf(best), np.nan, best)[inverse]
+
+def configurations(results):
+    # returns the name of the formulation of every run followed by its options that are not the default ones
+    # (see results_store.configuration_label), runs with different options are kept apart as different formulations
+    columns = [results[column] for column in CONFIGURATION]
+    return np.array([configuration_label(formulation, *options) for formulation, *options in zip(results['formulation'], *columns)])
+
+def formulation_groups(formulation, nodes):
+    # groups the runs by (formulation, nodes), returns (formulation of each group, nodes of each group,
+    # group of each run). The groups are sorted by formulation and then by number of nodes
+    formulations, formulation_index = np.unique(formulation, return_inverse = True)
+    sizes, size_index = np.unique(nodes, return_inverse = True)
+    keys, groups = np.unique(formulation_index * len(sizes) + size_index, return_inverse = True)
+    return formulations[keys // len(sizes)], sizes[keys % len(sizes)], groups
+
+def group_percentiles(groups, values, number_groups, percentiles):
+    # percentiles (linear interpolation, as np.percentile) of values in every group, ignoring NaN
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength = number_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((len(percentiles), number_groups), np.nan)
+    nonempty = counts > 0
+    for k, percentile in enumerate(percentiles):
+        position = starts[nonempty] + percentile / 100 * (counts[nonempty] - 1)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        result[k, nonempty] = values[lower] + (position - lower) * (values[upper] - values[lower])
+    return result
+
+def group_statistics(results, column = 'exec_time', time_limit = None, shift = 10, percentiles = (25, 75, 90)):
+    # computes statistics of a column for every formulation and number of nodes
+    # receives:
+    # (1) results: structured array (load_results)
+    # (2) column: column to be summarized. Example: 'exec_time', 'exec_time_relaxed', 'gap'
+    # (3) time_limit: runs solved to optimality after this time (seconds) are not counted as solved
+    # (4) shift: shift of the shifted geometric mean
+    # (5) percentiles: percentiles to compute besides the median
+    # returns a structured array with one row per (formulation, nodes) and the fields:
+    #   formulation, nodes, runs, mean, median, sgm (shifted geometric mean), p<percentile>,
+    #   solved (runs solved to optimality within the time limit) and
+    #   lp_gap (mean of (best objective value - relaxed objective value) / best objective value)
+    formulations, sizes, groups = formulation_groups(configurations(results), results['nodes'])
+    values = results[column].astype(float)
+    valid = ~np.isnan(values)
+    runs = np.bincount(groups, weights = valid, minlength = len(formulations))
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = np.bincount(groups, weights = np.where(valid, values, 0), minlength = len(formulations)) / runs
+        logs = np.log(np.where(valid, np.maximum(values, 0), 0) + shift)
+        sgm = np.exp(np.bincount(groups, weights = np.where(valid, logs, 0), minlength = len(formulations)) / runs) - shift
+        solved_runs = results['status'] == OPTIMAL
+        if time_limit is not None:
+            solved_runs &= results['exec_time'] <= time_limit
+        solved = np.bincount(groups, weights = solved_runs, minlength = len(formulations))
+        optimum = optimal_values(results)
+        lp_gaps = (optimum - results['obj_val_relaxed']) / optimum
+        lp_valid = ~np.isnan(lp_gaps)
+        lp_gap = np.bincount(groups, weights = np.where(lp_valid, lp_gaps, 0), minlength = len(formulations)) \
+            / np.bincount(groups, weights = lp_valid, minlength = len(formulations))
+    quantiles = group_percentiles(groups, values, len(formulations), (50,) + tuple(percentiles))
+
+    fields = [('formulation', formulations.dtype), ('nodes', 'i8'), ('runs', 'i8'), ('mean', 'f8'),
+              ('median', 'f8'), ('sgm', 'f8')] + [(f'p{percentile}', 'f8') for percentile in percentiles] \
+             + [('solved', 'i8'), ('lp_gap', 'f8')]
+    statistics = np.zeros(len(formulations), dtype = fields)
+    statistics['formulation'] = formulations
+    statistics['nodes'] = sizes
+    statistics['runs'] = runs
+    statistics['mean'] = mean
+    statistics['median'] = quantiles[0]
+    statistics['sgm'] = sgm
+    for k, percentile in enumerate(percentiles):
+        statistics[f'p{percentile}'] = quantiles[k + 1]
+    statistics['solved'] = solved
+    statistics['lp_gap'] = lp_gap
+    return statistics
+
+def build_and_solve(results):
+    # returns a structured array with one row per (formulation, nodes) and the mean time (seconds) spent
+    # building the model (build), solving it (solve, relaxed and original problems) and the fraction
+    # build / (build + solve). Runs without the time of the phases (older runs) are not counted.
+    # Runs that loaded the model from the model cache are a group of their own ('DFJ+cached'), to compare
+    # them with the runs that built it
+    cached = results['model_cached'] == 1
+    formulations, sizes, groups = formulation_groups(np.char.add(configurations(results), np.where(cached, '+cached', '')),
+                                                     results['nodes'])
+    # a cached model skips init, formulation and update (NULL); the preprocessing and the model cache
+    # (loading or saving the model) are part of the build when they are used
+    build = sum(np.where(cached, np.nan_to_num(results[phase]), results[phase]) for phase in BUILD_PHASES) \
+        + np.nan_to_num(results['time_preprocess']) + np.nan_to_num(results['time_cache'])
+    # the change of the variables to continuous is part of wall_time_relaxed, but it is not solving
+    relax = np.nan_to_num(results['time_relax'])
+    solve = np.nan_to_num(results['wall_time']) + np.nan_to_num(results['wall_time_relaxed']) - relax
+    build = build + relax
+    valid = ~np.isnan(build)
+    runs = np.bincount(groups, weights = valid, minlength = len(formulations))
+    split = np.zeros(len(formulations), dtype = [('formulation', formulations.dtype), ('nodes', 'i8'), ('runs', 'i8'),
+                                                     ('build', 'f8'), ('solve', 'f8'), ('build_fraction', 'f8')])
+    split['formulation'] = formulations
+    split['nodes'] = sizes
+    split['runs'] = runs
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        split['build'] = np.bincount(groups, weights = np.where(valid, build, 0), minlength = len(formulations)) / runs
+        split['solve'] = np.bincount(groups, weights = np.where(valid, solve, 0), minlength = len(formulations)) / runs
+        split['build_fraction'] = split['build'] / (split['build'] + split['solve'])
+    return split
+
+def pivot(results, column):
+    # returns (instances, nodes of each instance, formulations, matrix) where matrix[i, f] is the value of
+    # column in the last run of formulation f on instance i that has it (NaN if there is none)
+    instances, instance_index = np.unique(results['instance'], return_inverse = True)
+    formulations, formulation_index = np.unique(configurations(results), return_inverse = True)
+    matrix = np.full((len(instances), len(formulations)), np.nan)
+    nodes = np.zeros(len(instances), dtype = int)
+    # runs without the column (missing values, see load_results) don't hide older runs: an 'lp' run
+    # keeps the exec_time of an older 'mip' run
+    values = results[column]
+    present = ~np.isnan(values) if values.dtype.kind == 'f' else values != - 1
+    # the last run of every (instance, formulation) is the one kept
+    cells = (instance_index * len(formulations) + formulation_index)[present]
+    _, last = np.unique(cells[::-1], return_index = True)
+    last = np.flatnonzero(present)[len(cells) - 1 - last]
+    matrix[instance_index[last], formulation_index[last]] = values[last]
+    nodes[instance_index] = results['nodes']
+    return instances, nodes, formulations, matrix
+
+def axis_limits(values, log = False):
+    # limits of an axis that contain every (finite) value with a margin of 5%
+    values = values[np.isfinite(values)]
+    if log:
+        values = values[values > 0]
+    if len(values) == 0:
+        return None
+    low, high = values.min(), values.max()
+    if log:
+        return low / 1.2, high * 1.2
+    margin = (high - low) * 0.05 or abs(high) * 0.05 or 1
+    return low - margin, high + margin
+
+def plot_comparison(results, formulation1, formulation2, column, nodes_comparing = None, path = 'graphs', log = False):
+    # scatter plot of a column of formulation1 (x axis) against formulation2 (y axis), one point per
+    # instance solved by both and one color per number of nodes. The limits are taken from the data
+    instances, nodes, formulations, matrix = pivot(results, column)
+    x = matrix[:, list(formulations).index(formulation1)]
+    y = matrix[:, list(formulations).index(formulation2)]
+    both = ~np.isnan(x) & ~np.isnan(y)
+    figure, axes = plt.subplots()
+    for node in (np.unique(nodes[both]) if nodes_comparing is None else nodes_comparing):
+        selected = both & (nodes == node)
+        axes.scatter(x[selected], y[selected], marker = '*', label = f'{node} nodes')
+    limits = axis_limits(np.concatenate((x[both], y[both])), log)
+    if limits is not None:
+        axes.plot(limits, limits, color = 'red', linewidth = 1) # y = x line
+        axes.set_xlim(limits)
+        axes.set_ylim(limits)
+    if log:
+        axes.set_xscale('log')
+        axes.set_yscale('log')
+    axes.set_aspect('equal', adjustable = 'box')
+    axes.set_xlabel(formulation1)
+    axes.set_ylabel(formulation2)
+    axes.set_title(f'{formulation1} vs {formulation2}')
+    axes.legend()
+    figure.savefig(os.path.join(path, f'{formulation1}_{formulation2}_{column}.pdf'), format = 'pdf')
+    plt.close(figure)
+
+def performance_profile(results, column = 'exec_time', path = 'graphs', time_limit = None):
+    # Dolan-More performance profile: for every formulation, fraction of the instances whose value
+    # (lower is better) is at most tau times the best value of any formulation. For 'exec_time', runs
+    # not solved to optimality (or solved after time_limit) count as failures
+    instances, nodes, formulations, matrix = pivot(results, column)
+    if column == 'exec_time':
+        _, _, _, status = pivot(results, 'status')
+        failed = status != OPTIMAL
+        if time_limit is not None:
+            failed |= matrix > time_limit
+        matrix = np.where(failed, np.nan, matrix)
+    matrix = np.where(np.isnan(matrix), np.inf, np.maximum(matrix, 1e-6))
+    best = matrix.min(axis = 1, keepdims = True)
+    ratios = (matrix / best)[np.isfinite(best.ravel())]
+    figure, axes = plt.subplots()
+    if len(ratios):
+        finite = ratios[np.isfinite(ratios)]
+        taus = np.unique(np.concatenate(([1], finite, [finite.max() * 1.1])))
+        for k, formulation in enumerate(formulations):
+            fraction = (ratios[:, k][None, :] <= taus[:, None]).mean(axis = 1)
+            axes.step(taus, fraction, where = 'post', label = formulation)
+        axes.set_xscale('log')
+    axes.set_ylim(0, 1.05)
+    axes.set_xlabel('tau (ratio to the best formulation)')
+    axes.set_ylabel('fraction of instances')
+    axes.set_title(f'Performance profile ({column})')
+    axes.legend()
+    figure.savefig(os.path.join(path, f'performance_profile_{column}.pdf'), format = 'pdf')
+    plt.close(figure)
+
+def plot_all(results, columns = ('exec_time', 'obj_val_relaxed'), path = 'graphs', time_limit = None):
+    # generates the comparison of every pair of formulations for every column (times in logarithmic scale)
+    # and the performance profile of every time column
+    formulations = np.unique(configurations(results))
+    for column in columns:
+        log = 'time' in column
+        for formulation1, formulation2 in combinations(formulations, 2):
+            plot_comparison(results, formulation1, formulation2, column, path = path, log = log)
+        if log:
+            performance_profile(results, column, path, time_limit)
+
+def primal_dual_integrals(trajectories, time_limit = None):
+    # returns a structured array with one row per (formulation, nodes) and the fields formulation, nodes,
+    # runs and integral (mean primal-dual integral of the runs, see trajectory.py)
+    # receives trajectories: list of (formulation, instance, nodes, samples), see trajectory.load_trajectories
+    formulations, sizes, groups = formulation_groups([row[0] for row in trajectories], [row[2] for row in trajectories])
+    integrals = np.array([primal_dual_integral(samples, time_limit) for _, _, _, samples in trajectories])
+    statistics = np.zeros(len(formulations), dtype = [('formulation', formulations.dtype), ('nodes', 'i8'), ('runs', 'i8'), ('integral', 'f8')])
+    statistics['formulation'] = formulations
+    statistics['nodes'] = sizes
+    statistics['runs'] = np.bincount(groups, minlength = len(formulations))
+    statistics['integral'] = np.bincount(groups, weights = integrals, minlength = len(formulations)) / statistics['runs']
+    return statistics
+
+def plot_primal_dual_integrals(trajectories, time_limit = None, path = 'graphs'):
+    # mean primal-dual integral of every formulation against the number of nodes (logarithmic scale)
+    statistics = primal_dual_integrals(trajectories, time_limit)
+    figure, axes = plt.subplots()
+    for formulation in np.unique(statistics['formulation']):
+        rows = statistics[statistics['formulation'] == formulation]
+        axes.plot(rows['nodes'], rows['integral'], marker = '*', label = formulation)
+    axes.set_yscale('log')
+    axes.set_xlabel('nodes')
+    axes.set_ylabel('primal-dual integral (seconds)')
+    axes.set_title('Primal-dual integral')
+    axes.legend()
+    figure.savefig(os.path.join(path, 'primal_dual_integral.pdf'), format = 'pdf')
+    plt.close(figure)
+
+def plot_gap_over_time(trajectories, instance, path = 'graphs', log = False):
+    # gap of every formulation over time on one instance (the last run of each formulation), the gap
+    # is not drawn before the first incumbent
+    runs = {formulation: samples for formulation, name, _, samples in trajectories if name == instance}
+    figure, axes = plt.subplots()
+    for formulation, samples in sorted(runs.items()):
+        found = np.isfinite(samples[:, 4])
+        axes.step(samples[found, 0], 100 * samples[found, 4], where = 'post', label = formulation)
+    if log:
+        axes.set_xscale('log')
+    axes.set_xlabel('time (seconds)')
+    axes.set_ylabel('gap (%)')
+    axes.set_title(f'Gap over time ({os.path.basename(instance)})')
+    axes.legend()
+    figure.savefig(os.path.join(path, f'gap_{os.path.basename(instance)}.pdf'), format = 'pdf')
+    plt.close(figure)
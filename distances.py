@@ -0,0 +1,104 @@
+# file that computes the distance matrix of an instance in one vectorized pass
+# and caches it, so every formulation (and every run) shares the same read-only matrix
+
+import glob
+import hashlib
+import numpy as np
+import os
+from tsplib95 import load
+
+EARTH_RADIUS = 6378.388 # same radius used by TSPLIB for GEO instances
+
+_matrices = {} # distance matrices already computed in this process, by content key
+MAX_MATRICES = 256 # the oldest matrices are forgotten after this number (long sweeps)
+
+def node_coordinates(problem, nodes = None):
+    # returns the (n x d) array of coordinates of the nodes (in the order of nodes, problem.get_nodes() by default),
+    # None if the instance has no coordinates. Instances that keep them in an array (coordinates, see
+    # instance_archive.py) are read directly, without building the dictionary node_coords
+    if hasattr(problem, 'coordinates'):
+        return np.ascontiguousarray(problem.coordinates, dtype = float)
+    if not problem.node_coords:
+        return None
+    nodes = list(problem.get_nodes()) if nodes is None else nodes
+    return np.array([problem.node_coords[i] for i in nodes], dtype = float)
+
+def content_key(problem):
+    # returns a hash that identifies the content (type of weights and coordinates) of an instance
+    key = hashlib.sha1(f'{problem.edge_weight_type},{problem.dimension}'.encode())
+    if hasattr(problem, 'coordinates'):
+        key.update(node_coordinates(problem).tobytes())
+    elif problem.node_coords:
+        key.update(np.array(list(problem.node_coords.values()), dtype = float).tobytes())
+    else:
+        # explicit instances: the weights are the content
+        key.update(repr([problem.get_weight(i, j) for i in problem.get_nodes() for j in problem.get_nodes()]).encode())
+    return key.hexdigest()
+
+def geo_coordinates(coordinates):
+    # converts TSPLIB GEO coordinates (DDD.MM) to radians
+    degrees = np.trunc(coordinates)
+    return np.radians(degrees + (coordinates - degrees) * 5 / 3)
+
+def compute_distances(problem):
+    # returns the (n x n) matrix of weights of a problem, in the order of problem.get_nodes()
+    # GEO, EUC_2D, EUC_3D and CEIL_2D instances are computed with NumPy, rounded as tsplib95 does,
+    # any other type is computed with problem.get_weight
+    nodes = list(problem.get_nodes())
+    if problem.edge_weight_type == 'GEO':
+        lat, lng = geo_coordinates(node_coordinates(problem, nodes)).T
+        q1 = np.cos(lng[:, None] - lng[None, :])
+        q2 = np.cos(lat[:, None] - lat[None, :])
+        q3 = np.cos(lat[:, None] + lat[None, :])
+        angle = np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), - 1, 1))
+        return np.trunc(EARTH_RADIUS * angle + 1)
+    if problem.edge_weight_type in ['EUC_2D', 'EUC_3D', 'CEIL_2D']:
+        coordinates = node_coordinates(problem, nodes)
+        distance = np.sqrt(((coordinates[:, None, :] - coordinates[None, :, :]) ** 2).sum(axis = 2))
+        if problem.edge_weight_type == 'CEIL_2D':
+            return np.ceil(distance)
+        return np.trunc(distance + 0.5)
+    return np.array([[problem.get_weight(i, j) for j in nodes] for i in nodes], dtype = float)
+
+def cache_file(filename, key):
+    # name of the cached matrix of an instance file: 'instance.tsp.<key>.npy' next to the instance
+    return f'{filename}.{key[:16]}.npy'
+
+def distance_matrix(problem, filename = None):
+    # returns the (read-only) distance matrix of a problem
+    # receives:
+    # (1) problem: tsplib95 problem
+    # (2) filename: file of the instance. If given, the matrix is saved next to it as a .npy file
+    #               and memory-mapped in later runs (a change in the instance changes the key)
+    key = content_key(problem)
+    if key in _matrices:
+        return _matrices[key]
+    if filename is None:
+        matrix = compute_distances(problem)
+        matrix.setflags(write = False)
+    else:
+        path = cache_file(filename, key)
+        if not os.path.exists(path):
+            # written to a temporary file first so that other processes never read half a matrix
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as file:
+                np.save(file, compute_distances(problem))
+            os.replace(temporary, path)
+            # matrices of older contents of the same file are not used anymore
+            for old in glob.glob(f'{glob.escape(filename)}.*.npy'):
+                if old != path and len(os.path.basename(old)) == len(os.path.basename(path)):
+                    try:
+                        os.remove(old)
+                    except OSError: # deleted by another process
+                        pass
+        matrix = np.load(path, mmap_mode = 'r')
+    if len(_matrices) >= MAX_MATRICES:
+        del _matrices[next(iter(_matrices))]
+    _matrices[key] = matrix
+    return matrix
+
+def load_problem(filename):
+    # loads an instance in TSPLIB format and caches its distance matrix next to the file
+    problem = load(filename)
+    distance_matrix(problem, filename)
+    return problem
@@ -4,91 +4,219 @@ import gurobipy as gp
 from gurobipy import GRB
 import itertools
 import numpy as np
+import os
+import time
+from separation import violated_subsets
+from distances import distance_matrix, node_coordinates
+from results_store import ResultsStore, configuration
+from heuristics import heuristic_tour
+from instrumentation import Instrumentation
+from model_cache import ModelCache, model_key
+from trajectory import TrajectoryRecorder, encode
+from preprocessing import incidence, nearest_neighbour_arcs, delaunay_arcs, tour_arcs, subtour_relaxation, reduced_cost_arcs
+
+def create_env(username, params = {}):
+    # Creates and starts a Gurobi environment
+    # receives:
+    # (1) username of Gurobi (None to use the default license)
+    # (2) params: parameters that must be set before the environment starts. Example: {'MemLimit': 8}
+    env = gp.Env(empty = True)
+    if username is not None:
+        env.setParam('username', username)
+    for param, value in params.items():
+        env.setParam(param, value)
+    env.start()
+    return env
 
 class Solver:
     # Father class that solves different formulations, receives:
     #  (1) name of the file of the instance: 'file_name.tsp'
     #  (2) maximum time of execution in seconds.
     #  (3) username of Gurobi
-    def __init__(self, problem, time_limit, username):
+    #  (4) vectorized: builds the model with matrix variables and constraints over
+    #      a NumPy distance matrix (True) or with the original generator expressions (False).
+    #      Both give the same model except in Multi_Commodity, whose vectorized model only has the
+    #      variables and restrictions of the commodities that are used (smaller, same optimum)
+    #  (5) env: Gurobi environment to use, a new one is created if None (see create_env)
+    #  (6) threads: number of threads used by Gurobi
+    #  (7) results: path of the results database (see results_store.py)
+    #  (8) warm_start: gives Gurobi a tour found by heuristics.py as starting solution (MIP start).
+    #      Off by default so formulations are compared under the same conditions
+    #  (9) mode: 'lp' solves only the relaxed problem, 'mip' only the original problem and
+    #      'lp_mip' the relaxed problem first and then the original one, both in the same model
+    # (10) profile: profiler run around formulation(): None, 'cprofile' (statistics saved in
+    #      profiles/formulation/instance.prof) or 'tracemalloc' (see instrumentation.py)
+    # (11) cache: folder of the model cache (see model_cache.py). The model built is saved there and loaded
+    #      instead of being built again in later runs of the same formulation and instance. None to disable it
+    # (12) log: saves the Gurobi log in logs/test/formulation/instance.log, False for high-volume sweeps
+    # (13) trajectory: seconds between samples of the incumbent and best bound of the original problem,
+    #      saved with the run (see trajectory.py). None to disable it
+    # (14) candidates: keeps only the arcs between near nodes, k (int) nearest neighbours of every node or
+    #      'delaunay' (Delaunay triangulation of the coordinates). The solution is checked on the complete
+    #      graph (full_graph_optimal in the results). None to keep every arc
+    # (15) fix_arcs: removes the arcs that can't be in an optimal tour by their reduced cost in the LP
+    #      relaxation of DFJ and the cost of a heuristic tour (exact). See preprocessing.py
+    # The removed arcs have their x variables fixed to 0, vectorized formulations (and Log_Lex) build the rest
+    # of the model only over the arcs kept (self.tails, self.heads, self.arcs)
+    cacheable = True # formulations whose formulation() does more than adding variables and restrictions set it to False
+    def __init__(self, problem, time_limit, username, vectorized = True, env = None, threads = 1, results = 'results.db',
+                 warm_start = False, mode = 'lp_mip', profile = None, cache = None, log = True, trajectory = None,
+                 candidates = None, fix_arcs = False):
         # Initialize the problem
         self.problem = problem
         self.time_limit = time_limit
         self.username = username
-        self.env = gp.Env()
-        self.env.setParam('username', username)
-        self.model = gp.Model('tsp', env = self.env)
+        self.vectorized = vectorized
+        self.results = results
+        self.warm_start = warm_start
+        if mode not in ['lp', 'lp_mip', 'mip']:
+            raise ValueError(f"mode must be 'lp', 'lp_mip' or 'mip', not {mode!r}")
+        self.mode = mode
+        if candidates is not None and candidates != 'delaunay' and not (isinstance(candidates, int) and candidates > 0):
+            raise ValueError(f"candidates must be a positive int or 'delaunay', not {candidates!r}")
+        self.candidates = candidates
+        self.fix_arcs = fix_arcs
+        self.heuristic_obj = None
+        self.heuristic_time = None
+        self.nodes = list(self.problem.get_nodes())
+        self.n = len(self.nodes)
+        # Positions (0 to n - 1) of the tail and head of every arc (i != j), ordered by tail
+        self.tails, self.heads = np.nonzero(~np.eye(self.n, dtype = bool))
+        self.arcs = [(self.nodes[a], self.nodes[b]) for a, b in zip(self.tails, self.heads)]
         self.formulation_name = type(self).__name__
+        instance = os.path.basename(self.problem.name)
+        # Time of every phase of the run (saved with the results)
+        self.instrumentation = Instrumentation(profile, f'profiles/{self.formulation_name}/{instance}.prof')
+        with self.instrumentation.phase('env'):
+            self.env = env if env is not None else create_env(username)
+
+        # Removes arcs of the complete graph (self.relaxation is the LP relaxation used to check the solution)
+        self.relaxation = None
+        if self.candidates is not None or self.fix_arcs:
+            with self.instrumentation.phase('preprocess'):
+                self.preprocess()
+        # Sums of the arcs that leave (outgoing @ x) and enter (incoming @ x) each node
+        self.outgoing, self.incoming = incidence(self.tails, self.n), incidence(self.heads, self.n)
+
+        # Loads the model from the model cache if it was built before
+        self.model_cache = ModelCache(cache) if cache is not None and self.cacheable else None
+        cached = None
+        if self.model_cache is not None:
+            with self.instrumentation.phase('cache'):
+                self.model_key = model_key(self)
+                cached = self.model_cache.load(self.model_key, self.env)
+        self.cached = cached is not None
+        if self.cached:
+            self.model, index = cached
+        else:
+            with self.instrumentation.phase('env'):
+                self.model = gp.Model('tsp', env = self.env)
 
         # Modify Parameters
         self.model.setParam('TimeLimit', self.time_limit)
-        self.model.setParam("Threads", 1)
+        self.model.setParam("Threads", threads)
         self.model.setParam('Heuristics', 0)
         self.model.setParam('Cuts', 0)
 
         # Generate log file 
-        instance = self.problem.name.split('/')[1]
-        log_file = f'logs/test/{self.formulation_name}/{instance}.log' 
-        # In this case, the log file is saved in logs -> test -> self.formulation.name (DFJ, MTZ, etc)
-        # The files must be created before executing the code (not instance.log)
-        # with the name 'instance.log' 
-        self.model.setParam('LogFile', log_file)
-
-        # TSP for all formulations
-        self.x = self.model.addVars(self.problem.get_edges(), vtype = GRB.BINARY, name = "x")
-        self.model.addConstrs((gp.quicksum(self.x[i,j] for j in self.problem.get_nodes() if i != j) == 1 for i in self.problem.get_nodes()), name = f"RA")
-        self.model.addConstrs((gp.quicksum(self.x[i,j] for i in self.problem.get_nodes() if i != j) == 1 for j in self.problem.get_nodes()), name = f"RB")
+        if log:
+            log_file = f'logs/test/{self.formulation_name}/{instance}.log' 
+            # In this case, the log file is saved in logs -> test -> self.formulation.name (DFJ, MTZ, etc)
+            # with the name 'instance.log', the folders are created if they don't exist
+            os.makedirs(os.path.dirname(log_file), exist_ok = True)
+            self.model.setParam('LogFile', log_file)
+
+        # Callbacks called during the optimization (see run_callbacks)
+        self.callbacks = []
+        self.recorder = TrajectoryRecorder(trajectory) if trajectory is not None else None
+        if self.recorder is not None:
+            self.callbacks.append(self.recorder)
+
+        # TSP for all formulations (only the x variables are needed if the model was cached)
+        if self.cached:
+            with self.instrumentation.phase('cache'):
+                self.load_variables(index)
+            return
+        with self.instrumentation.phase('init'):
+            if self.vectorized:
+                # self.X is the (n x n) matrix variable, self.x gives access to it by nodes
+                self.distances = distance_matrix(self.problem)
+                self.X = self.model.addMVar((self.n, self.n), vtype = GRB.BINARY, name = self.names("x", 2))
+                self.x = gp.tupledict(zip(((i, j) for i in self.nodes for j in self.nodes), itertools.chain(*self.X.tolist())))
+                self.model.addConstr(self.leaving(self.X) == 1, name = self.names("RA", 1))
+                self.model.addConstr(self.entering(self.X) == 1, name = self.names("RB", 1))
+                self.remove_arcs(self.X)
+            else:
+                self.x = self.model.addVars(self.problem.get_edges(), vtype = GRB.BINARY, name = "x")
+                self.model.addConstrs((gp.quicksum(self.x[i,j] for j in self.problem.get_nodes() if i != j) == 1 for i in self.problem.get_nodes()), name = f"RA")
+                self.model.addConstrs((gp.quicksum(self.x[i,j] for i in self.problem.get_nodes() if i != j) == 1 for j in self.problem.get_nodes()), name = f"RB")
+                self.remove_arcs(self.x)
 
         # Update
-        self.model.update()
+        with self.instrumentation.phase('update'):
+            self.model.update()
     
     def solve(self):
-        # Solves the original and relaxed problem
+        # Solves the relaxed and/or original problem (see mode)
+
+        # Sets objective and includes the formulation (a cached model already has both)
+        if not self.cached:
+            with self.instrumentation.phase('init'):
+                if self.vectorized:
+                    self.model.setObjective(self.distances[self.tails, self.heads] @ self.X[self.tails, self.heads], GRB.MINIMIZE)
+                else:
+                    self.model.setObjective(gp.quicksum(self.problem.get_weight(i, j) * self.x[i, j] for j in self.problem.get_nodes() for i in self.problem.get_nodes() if i != j), GRB.MINIMIZE)
+            with self.instrumentation.phase('formulation'), self.instrumentation.profiled():
+                self.formulation()
+            with self.instrumentation.phase('update'):
+                self.model.update()
+            if self.model_cache is not None:
+                with self.instrumentation.phase('cache'):
+                    self.model_cache.save(self.model_key, self.model, {'x': [0, self.n * self.n]})
+
+        # Size of the model (restrictions added later, like lazy ones, are not counted)
+        results = {'num_vars': self.model.NumVars, 'num_constrs': self.model.NumConstrs, 'num_nzs': self.model.NumNZs,
+                   'num_arcs': len(self.arcs), 'model_cached': int(self.cached)}
+        # Solves the relaxed problem in the same model (integer variables changed to continuous)
+        if self.mode in ['lp', 'lp_mip']:
+            start = time.time()
+            with self.instrumentation.phase('relax'):
+                integer = [var for var in self.model.getVars() if var.VType != GRB.CONTINUOUS]
+                types = self.model.getAttr('VType', integer)
+                self.model.setAttr('VType', integer, [GRB.CONTINUOUS] * len(integer))
+                self.model.update()
+            results['obj_val_relaxed'], results['exec_time_relaxed'] = self.solve_relaxed(self.model)
+            # Restrictions added while solving the relaxed problem (DFJ_Lazy) stay for the original problem
+            with self.instrumentation.phase('relax'):
+                self.model.setAttr('VType', integer, types)
+                self.model.update()
+            results['wall_time_relaxed'] = time.time() - start
 
-        # Sets objective, creates relaxed problem and and includes the formulation
-        self.model.setObjective(gp.quicksum(self.problem.get_weight(i, j) * self.x[i, j] for j in self.problem.get_nodes() for i in self.problem.get_nodes() if i != j), GRB.MINIMIZE)
-        self.formulation()
-        self.model.update()
-        self.model_relax = self.model.relax()
-
-        # Solves the problem 
-        obj_val, exec_time, gap, bestbound = self.solve_no_relaxed(self.model)
-        # Solves the relaxed problem
-        obj_val_relaxed, time_exec_relaxed = self.solve_relaxed(self.model_relax)
-
-        #No relaxed: 
-        # (0) formulation name 
-        # (1) problem name 
-        # (2) # nodes
-        # (3) status
-        # (4) Objective Value
-        # (5) Best Bound
-        # (6) GAP
-        # (7) Execution Time
-        results = f'{self.formulation_name},{self.problem.name},{len(list(self.problem.get_nodes()))},{self.model.status},{obj_val},{bestbound},{gap},{exec_time}'
-
-        # Relaxed
-        # (0) formulation name 
-        # (1) problem name 
-        # (2) # nodes
-        # (3) Objective Value Relaxed
-        # (4) Execution Time
-        results_relaxed = f'{self.formulation_name},{self.problem.name},{len(list(self.problem.get_nodes()))},{obj_val_relaxed}, {time_exec_relaxed}'
-
-
-        # Saves the results in 2 different files
-        file_no_relaxed = 'results_no_relaxed.txt' # Change name if necessary
-        file_relaxed = 'results_relaxed.txt'    # Change name if necessary
-        with open(file_no_relaxed, "a") as file:
-            file.write(results + "\n")
-        with open(file_relaxed, "a") as file:
-            file.write(results_relaxed + "\n")
-            
-        self.model.resetParams()
+        # Solves the original problem
+        if self.mode in ['mip', 'lp_mip']:
+            start = time.time()
+            if self.warm_start:
+                self.set_start()
+            obj_val, exec_time, gap, bestbound = self.solve_no_relaxed(self.model)
+            if self.recorder is not None:
+                self.recorder.finish(self.model)
+                results['trajectory'] = encode(self.recorder.array())
+            results.update(status = self.model.status, obj_val = obj_val, best_bound = bestbound, gap = gap, exec_time = exec_time,
+                           heuristic_obj = self.heuristic_obj, heuristic_time = self.heuristic_time,
+                           wall_time = time.time() - start)
+            if self.relaxation is not None and self.model.status == GRB.OPTIMAL:
+                results['full_graph_optimal'] = int(self.optimal_on_full_graph(obj_val))
+
+        # Saves the results as one run of the results database (see results_store.py)
+        with ResultsStore(self.results) as store:
+            store.add_run(self.formulation_name, self.problem.name, self.n, extra = self.results_extra(), mode = self.mode,
+                          **configuration(self.vectorized, self.warm_start, self.candidates, self.fix_arcs,
+                                          None if self.recorder is None else self.recorder.interval),
+                          **results, **self.instrumentation.results())
 
     def solve_no_relaxed(self, model):
         # Solves the original problem
-        model.optimize()
+        model.optimize(self.run_callbacks if self.callbacks else None)
         objective_value = model.ObjVal
         time_execution = model.runtime
         gap = model.MIPGap
@@ -104,6 +232,92 @@ class Solver:
 
         return objective_value_relaxed, time_execution
     
+    def set_start(self):
+        # Finds a tour with heuristics.py and sets it as starting solution of the x variables
+        # (Gurobi completes the values of the other variables of the formulation)
+        start = time.time()
+        tour, self.heuristic_obj = heuristic_tour(distance_matrix(self.problem))
+        successor = {self.nodes[a]: self.nodes[b] for a, b in zip(tour, np.roll(tour, - 1))}
+        variables = list(self.x.keys())
+        self.model.setAttr('Start', [self.x[i, j] for i, j in variables], [1 if successor[i] == j else 0 for i, j in variables])
+        self.heuristic_time = time.time() - start
+
+    def load_variables(self, index):
+        # Gives access to the x variables of a model loaded from the model cache, index['x'] is
+        # [position of the first x variable, number of x variables] (x[i,j] ordered by i and then j)
+        first, count = index['x']
+        variables = self.model.getVars()[first:first + count]
+        if self.vectorized:
+            self.distances = distance_matrix(self.problem)
+            self.X = gp.MVar.fromlist(variables).reshape(self.n, self.n)
+        self.x = gp.tupledict(zip(((i, j) for i in self.nodes for j in self.nodes), variables))
+
+    def names(self, name, dimensions):
+        # Names of the variables or restrictions of a matrix indexed by nodes: name[i] or name[i,j]
+        if dimensions == 1:
+            return np.array([f"{name}[{i}]" for i in self.nodes])
+        return np.array([[f"{name}[{i},{j}]" for j in self.nodes] for i in self.nodes])
+
+    def leaving(self, M):
+        # sum of the arcs (i, j) that leave each node i of a (n x n) matrix variable
+        return self.outgoing @ M[self.tails, self.heads]
+
+    def entering(self, M):
+        # sum of the arcs (j, i) that enter each node i of a (n x n) matrix variable
+        return self.incoming @ M[self.tails, self.heads]
+
+    def preprocess(self):
+        # Keeps the arcs of the candidate graph (and of a heuristic tour, so that there is always a tour)
+        # that reduced cost fixing doesn't remove, see preprocessing.py
+        distances = distance_matrix(self.problem)
+        tour, upper_bound = heuristic_tour(distances)
+        arcs = ~np.eye(self.n, dtype = bool)
+        if self.candidates == 'delaunay':
+            coordinates = node_coordinates(self.problem, self.nodes)
+            if coordinates is None:
+                raise ValueError("candidates = 'delaunay' needs the coordinates of the nodes")
+            arcs &= delaunay_arcs(coordinates) | tour_arcs(tour, self.n)
+        elif self.candidates is not None:
+            arcs &= nearest_neighbour_arcs(distances, self.candidates) | tour_arcs(tour, self.n)
+        self.relaxation = subtour_relaxation(distances, self.env)
+        if self.fix_arcs:
+            arcs &= reduced_cost_arcs(*self.relaxation, upper_bound)
+        self.tails, self.heads = np.nonzero(arcs)
+        self.arcs = [(self.nodes[a], self.nodes[b]) for a, b in zip(self.tails, self.heads)]
+
+    def removed_arcs(self):
+        # positions (tails, heads) of the arcs removed by the preprocessing
+        kept = np.eye(self.n, dtype = bool)
+        kept[self.tails, self.heads] = True
+        return np.nonzero(~kept)
+
+    def remove_arcs(self, M):
+        # fixes to 0 the variables of the removed arcs, M is a (n x n) matrix variable or a tupledict by nodes
+        tails, heads = self.removed_arcs()
+        if len(tails) == 0:
+            return
+        if isinstance(M, gp.MVar):
+            variables = M[tails, heads].tolist()
+        else:
+            variables = [M[self.nodes[a], self.nodes[b]] for a, b in zip(tails, heads)]
+        self.model.setAttr('UB', variables, [0] * len(variables))
+
+    def optimal_on_full_graph(self, value):
+        # True if no tour that uses a removed arc can cost less than value (the cost of the solution),
+        # by the reduced costs of the LP relaxation on the complete graph
+        bound, reduced_costs = self.relaxation
+        tails, heads = self.removed_arcs()
+        return bool(np.all(bound + reduced_costs[tails, heads] >= value - 1e-6))
+
+    def run_callbacks(self, model, where):
+        # Gurobi callback, calls every function in self.callbacks
+        for callback in self.callbacks:
+            callback(model, where)
+
+    def results_extra(self):
+        # Formulation specific results saved with the run (dictionary)
+        return {}
+
     def formulation(self):
         # Abstract function
         pass
@@ -112,81 +326,204 @@ class Solver:
 
 class DFJ(Solver):
     # DFJ formulation
-    def __init__(self, problem, time_limit, username):
+    def __init__(self, problem, time_limit, username, **options):
         # Inherit from Solver
-        super().__init__(problem, time_limit, username)
+        super().__init__(problem, time_limit, username, **options)
     
     def formulation(self):
-        # Sub-tour restrictions
-        for subset_size in range(2, len(list(self.problem.get_nodes()))):
-            for subset in itertools.combinations(range(1, len(list(self.problem.get_nodes())) + 1), subset_size):
-                self.model.addConstr(gp.quicksum(self.x[i, j] for i in subset for j in subset if i != j) <= subset_size - 1)
+        # Sub-tour restrictions (over the arcs kept, see Solver)
+        arcs = set(self.arcs)
+        for subset_size in range(2, self.n):
+            for subset in itertools.combinations(range(1, self.n + 1), subset_size):
+                self.model.addConstr(gp.quicksum(self.x[i, j] for i in subset for j in subset if (i, j) in arcs) <= subset_size - 1)
+
+class DFJ_Lazy(DFJ):
+    # DFJ formulation that starts only with the assignment restrictions and adds
+    # the violated sub-tour restrictions on the fly from a Gurobi callback:
+    #  - integer solutions: connected components (sub-tours) of the solution
+    #  - fractional solutions of the root node: global minimum cut
+    # The relaxed problem is solved with the same separation in a cutting plane loop
+    cacheable = False # formulation() sets a parameter and the callback, which are not saved with the model
+    def __init__(self, problem, time_limit, username, **options):
+        # Inherit from DFJ
+        super().__init__(problem, time_limit, username, **options)
+        self.lazy_cuts = 0
+        self.relaxed_cuts = 0
+        self.separation_time = 0
+
+    def formulation(self):
+        # Sub-tour restrictions are separated in separate()
+        self.model.setParam('LazyConstraints', 1)
+        self.arc_vars = [self.x[i, j] for i, j in self.arcs]
+        self.callbacks.append(self.separate)
+
+    def subsets(self, values, integral):
+        # Returns the subsets of nodes whose sub-tour restriction is violated by values (one per arc)
+        start = time.time()
+        weights = np.zeros((self.n, self.n))
+        np.add.at(weights, (self.tails, self.heads), values)
+        weights += weights.T
+        subsets = [[self.nodes[k] for k in subset] for subset in violated_subsets(weights, integral)]
+        self.separation_time += time.time() - start
+        return subsets
+
+    def separate(self, model, where):
+        # Callback that adds the violated sub-tour restrictions as lazy constraints
+        if where == GRB.Callback.MIPSOL:
+            subsets = self.subsets(np.array(model.cbGetSolution(self.arc_vars)), True)
+        elif where == GRB.Callback.MIPNODE and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.OPTIMAL \
+                and model.cbGet(GRB.Callback.MIPNODE_NODCNT) == 0:
+            subsets = self.subsets(np.array(model.cbGetNodeRel(self.arc_vars)), False)
+        else:
+            return
+        for subset in subsets:
+            model.cbLazy(gp.quicksum(self.x[i, j] for i in subset for j in subset if i != j) <= len(subset) - 1)
+        self.lazy_cuts += len(subsets)
+
+    def solve_relaxed(self, model_relaxed):
+        # Solves the relaxed problem adding violated sub-tour restrictions until there are none
+        # (they stay in the model for the original problem)
+        x = self.x
+        arc_vars = self.arc_vars
+        time_execution = 0
+        while True:
+            model_relaxed.optimize()
+            time_execution += model_relaxed.runtime
+            start = self.separation_time
+            subsets = self.subsets(np.array(model_relaxed.getAttr('X', arc_vars)), False)
+            time_execution += self.separation_time - start
+            if not subsets:
+                break
+            for subset in subsets:
+                model_relaxed.addConstr(gp.quicksum(x[i, j] for i in subset for j in subset if i != j) <= len(subset) - 1)
+            self.relaxed_cuts += len(subsets)
+        objective_value_relaxed = model_relaxed.ObjVal
+
+        return objective_value_relaxed, time_execution
+
+    def results_extra(self):
+        # lazy cuts added in the not relaxed problem, cuts added in the relaxed problem
+        # and total separation time (not relaxed and relaxed)
+        return {'lazy_cuts': self.lazy_cuts, 'relaxed_cuts': self.relaxed_cuts, 'separation_time': self.separation_time}
 
 class MTZ(Solver):
 
-    def __init__(self, problem, time_limit, username):
+    def __init__(self, problem, time_limit, username, **options):
         # Inherit from Solver
-        super().__init__(problem, time_limit, username)
+        super().__init__(problem, time_limit, username, **options)
 
     def formulation(self):
         # Sub-tour restrictions
+        if self.vectorized:
+            self.formulation_vectorized()
+            return
         self.u = self.model.addVars(self.problem.get_nodes(), vtype = GRB.CONTINUOUS, name = "u") 
         self.model.addConstrs(gp.quicksum(self.x[i,j] for j in self.problem.get_nodes() if i != j) == 1 for i in self.problem.get_nodes())
         self.model.addConstrs(gp.quicksum(self.x[i,j] for i in self.problem.get_nodes() if i != j) == 1 for j in self.problem.get_nodes())
-        self.model.addConstrs(self.u[i] - self.u[j] + (len(list(self.problem.get_nodes())) - 1) * self.x[i, j] <= len(list(self.problem.get_nodes())) - 2 for i in range(1, len(list(self.problem.get_nodes()))) for j in range(1, len(list(self.problem.get_nodes()))) if i != j)
-        self.model.addConstrs(self.u[i] >= 1 for i in range(1, len(list(self.problem.get_nodes()))))
-        self.model.addConstrs(self.u[i] <= len(list(self.problem.get_nodes())) - 1 for i in range(1, len(list(self.problem.get_nodes()))))
+        self.model.addConstrs(self.u[i] - self.u[j] + (self.n - 1) * self.x[i, j] <= self.n - 2 for i in range(1, self.n) for j in range(1, self.n) if i != j)
+        self.model.addConstrs(self.u[i] >= 1 for i in range(1, self.n))
+        self.model.addConstrs(self.u[i] <= self.n - 1 for i in range(1, self.n))
         self.model.addConstrs(self.x[i,j] <= 1 for i in self.problem.get_nodes() for j in self.problem.get_nodes() if i != j)
         self.model.addConstrs(self.x[i,j] >= 0 for i in self.problem.get_nodes() for j in self.problem.get_nodes() if i != j)
 
+    def formulation_vectorized(self):
+        # Same restrictions as formulation() as matrix restrictions, u[i] is in position i - 1
+        self.u = self.model.addMVar(self.n, vtype = GRB.CONTINUOUS, name = self.names("u", 1))
+        x = self.X[self.tails, self.heads]
+        self.model.addConstr(self.leaving(self.X) == 1)
+        self.model.addConstr(self.entering(self.X) == 1)
+        inner = (self.tails < self.n - 1) & (self.heads < self.n - 1) # nodes 1 to n - 1
+        tails, heads = self.tails[inner], self.heads[inner]
+        self.model.addConstr(self.u[tails] - self.u[heads] + (self.n - 1) * self.X[tails, heads] <= self.n - 2)
+        self.model.addConstr(self.u[:self.n - 1] >= 1)
+        self.model.addConstr(self.u[:self.n - 1] <= self.n - 1)
+        self.model.addConstr(x <= 1)
+        self.model.addConstr(x >= 0)
+
 class Single_Commodity(Solver):
 
-    def __init__(self, problem, time_limit, username):
+    def __init__(self, problem, time_limit, username, **options):
         # Inherit from Solver
-        super().__init__(problem, time_limit, username)
+        super().__init__(problem, time_limit, username, **options)
 
     def formulation(self):
         # Sub-tour restrictions
+        if self.vectorized:
+            self.formulation_vectorized()
+            return
         self.g = self.model.addVars(self.problem.get_edges(), vtype = GRB.CONTINUOUS, name = "g_ij")
-        self.model.addConstrs(gp.quicksum(self.g[j, i] for j in range(1, len(list(self.problem.get_nodes())) + 1)) -  gp.quicksum(self.g[i, j] for j in range(2, len(list(self.problem.get_nodes())) + 1)) == 1 for i in range(2, len(list(self.problem.get_nodes())) + 1))
-        self.model.addConstrs(self.g[i, j] >= 0 for i in range(1, len(list(self.problem.get_nodes())) + 1) for j in range(2, len(list(self.problem.get_nodes())) + 1))
-        self.model.addConstrs(self.g[i, j] <= (len(list(self.problem.get_nodes())) - 1) * self.x[i, j] for i in range(1, len(list(self.problem.get_nodes())) + 1) for j in range(2, len(list(self.problem.get_nodes())) + 1) if i != j)
+        self.model.addConstrs(gp.quicksum(self.g[j, i] for j in range(1, self.n + 1)) -  gp.quicksum(self.g[i, j] for j in range(2, self.n + 1)) == 1 for i in range(2, self.n + 1))
+        self.model.addConstrs(self.g[i, j] >= 0 for i in range(1, self.n + 1) for j in range(2, self.n + 1))
+        self.model.addConstrs(self.g[i, j] <= (self.n - 1) * self.x[i, j] for i in range(1, self.n + 1) for j in range(2, self.n + 1) if i != j)
+
+    def formulation_vectorized(self):
+        # Same restrictions as formulation() as matrix restrictions, g[i, j] is in position (i - 1, j - 1)
+        self.g = self.model.addMVar((self.n, self.n), vtype = GRB.CONTINUOUS, name = self.names("g_ij", 2))
+        self.remove_arcs(self.g)
+        self.model.addConstr(self.g[:, 1:].sum(axis = 0) - self.g[1:, 1:].sum(axis = 1) == 1)
+        self.model.addConstr(self.g[:, 1:] >= 0)
+        to_others = self.heads > 0 # arcs (i, j) with j != 1
+        tails, heads = self.tails[to_others], self.heads[to_others]
+        self.model.addConstr(self.g[tails, heads] <= (self.n - 1) * self.X[tails, heads])
 
 class Multi_Commodity(Solver):
 
-    def __init__(self, problem, time_limit, username):
+    def __init__(self, problem, time_limit, username, **options):
         # Inherit from Solver
-        super().__init__(problem, time_limit, username)
+        super().__init__(problem, time_limit, username, **options)
 
     def formulation(self):
         # Sub-tour restrictions
+        if self.vectorized:
+            self.formulation_vectorized()
+            return
         w = self.model.addVars(self.problem.get_edges(), self.problem.get_nodes(), self.problem.get_nodes(), name = "wl")
 
         self.model.addConstrs(gp.quicksum(self.x[i, j] for j in self.problem.get_nodes() if i != j) == 1 for i in self.problem.get_nodes())
         self.model.addConstrs(gp.quicksum(self.x[i, j] for i in self.problem.get_nodes() if i != j) == 1 for j in self.problem.get_nodes())
 
-        self.model.addConstrs(gp.quicksum(w[i, j, 1, l] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, 1, l] for j in self.problem.get_nodes()) == 0 for i in range(2, len(list(self.problem.get_nodes())) + 1) for l in range(2, len(list(self.problem.get_nodes())) + 1) if i != l)
-        self.model.addConstrs(gp.quicksum(w[1, j, 1, l] for j in range(2, len(list(self.problem.get_nodes())) + 1)) - gp.quicksum(w[j, 1, 1, l] for j in range(2, len(list(self.problem.get_nodes())) + 1)) == 1 for l in range(2, len(list(self.problem.get_nodes())) + 1))
-        self.model.addConstrs(gp.quicksum(w[i, j, 1, i] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, 1, i] for j in self.problem.get_nodes()) ==  - 1 for i in range(2, len(list(self.problem.get_nodes())) + 1))
-        self.model.addConstrs(gp.quicksum(w[i, j, k, 1] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, k, 1] for j in self.problem.get_nodes()) == 0 for i in range(2, len(list(self.problem.get_nodes())) + 1) for k in range(2, len(list(self.problem.get_nodes())) + 1) if i != k)
-        self.model.addConstrs(gp.quicksum(w[1, j, k, 1] for j in range(2, len(list(self.problem.get_nodes())) + 1)) - gp.quicksum(w[j, 1, k, 1] for j in range(2, len(list(self.problem.get_nodes())) + 1)) == - 1 for k in range(2, len(list(self.problem.get_nodes())) + 1))
-        self.model.addConstrs(gp.quicksum(w[i, j, i, 1] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, i, 1] for j in self.problem.get_nodes()) ==  1 for i in range(2, len(list(self.problem.get_nodes())) + 1))
-
-        self.model.addConstrs(w[i, j, 1, l] <= self.x[i,j] for i in self.problem.get_nodes() for j in self.problem.get_nodes() for l in range(2, len(list(self.problem.get_nodes())) + 1) if i != j)
-        self.model.addConstrs(w[i, j, 1, l] >= 0 for i in self.problem.get_nodes() for j in self.problem.get_nodes() for l in range(2, len(list(self.problem.get_nodes())) + 1) if i != j)
-        self.model.addConstrs(w[i, j, k, 1] <= self.x[i,j] for i in self.problem.get_nodes() for j in self.problem.get_nodes() for k in range(2, len(list(self.problem.get_nodes())) + 1) if i != j)
-        self.model.addConstrs(w[i, j, k, 1] >= 0 for i in self.problem.get_nodes() for j in self.problem.get_nodes() for k in range(2, len(list(self.problem.get_nodes())) + 1) if i != j)
-
+        self.model.addConstrs(gp.quicksum(w[i, j, 1, l] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, 1, l] for j in self.problem.get_nodes()) == 0 for i in range(2, self.n + 1) for l in range(2, self.n + 1) if i != l)
+        self.model.addConstrs(gp.quicksum(w[1, j, 1, l] for j in range(2, self.n + 1)) - gp.quicksum(w[j, 1, 1, l] for j in range(2, self.n + 1)) == 1 for l in range(2, self.n + 1))
+        self.model.addConstrs(gp.quicksum(w[i, j, 1, i] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, 1, i] for j in self.problem.get_nodes()) ==  - 1 for i in range(2, self.n + 1))
+        self.model.addConstrs(gp.quicksum(w[i, j, k, 1] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, k, 1] for j in self.problem.get_nodes()) == 0 for i in range(2, self.n + 1) for k in range(2, self.n + 1) if i != k)
+        self.model.addConstrs(gp.quicksum(w[1, j, k, 1] for j in range(2, self.n + 1)) - gp.quicksum(w[j, 1, k, 1] for j in range(2, self.n + 1)) == - 1 for k in range(2, self.n + 1))
+        self.model.addConstrs(gp.quicksum(w[i, j, i, 1] for j in self.problem.get_nodes()) - gp.quicksum(w[j, i, i, 1] for j in self.problem.get_nodes()) ==  1 for i in range(2, self.n + 1))
+
+        self.model.addConstrs(w[i, j, 1, l] <= self.x[i,j] for i in self.problem.get_nodes() for j in self.problem.get_nodes() for l in range(2, self.n + 1) if i != j)
+        self.model.addConstrs(w[i, j, 1, l] >= 0 for i in self.problem.get_nodes() for j in self.problem.get_nodes() for l in range(2, self.n + 1) if i != j)
+        self.model.addConstrs(w[i, j, k, 1] <= self.x[i,j] for i in self.problem.get_nodes() for j in self.problem.get_nodes() for k in range(2, self.n + 1) if i != j)
+        self.model.addConstrs(w[i, j, k, 1] >= 0 for i in self.problem.get_nodes() for j in self.problem.get_nodes() for k in range(2, self.n + 1) if i != j)
+
+    def formulation_vectorized(self):
+        # Same formulation with only the commodities that are used: commodity c = l - 2 goes from node 1
+        # to node l and commodity c = n - 1 + k - 2 goes from node k to node 1 (k, l = 2, ..., n).
+        # w[a, c] is the flow of commodity c on arc a (positions of self.tails, self.heads): n(n - 1) x 2(n - 1)
+        # variables instead of n^4. The repeated degree restrictions and the w >= 0 restrictions
+        # (already bounds of w) are not added
+        commodities = 2 * (self.n - 1)
+        sources = np.concatenate((np.zeros(self.n - 1, dtype = int), np.arange(1, self.n)))
+        sinks = np.concatenate((np.arange(1, self.n), np.zeros(self.n - 1, dtype = int)))
+        names = np.array([[f"wl[{i},{j},{self.nodes[k]},{self.nodes[l]}]" for k, l in zip(sources, sinks)] for i, j in self.arcs])
+        self.w = self.model.addMVar((len(self.arcs), commodities), vtype = GRB.CONTINUOUS, name = names)
+
+        # Flow conservation: flow out - flow in of each node and commodity is 1 at its source and -1 at its sink
+        supply = np.zeros((self.n, commodities))
+        supply[sources, np.arange(commodities)] = 1
+        supply[sinks, np.arange(commodities)] = - 1
+        self.model.addConstr(self.outgoing @ self.w - self.incoming @ self.w == supply)
+
+        # Flow only on arcs of the tour
+        self.model.addConstr(self.w <= self.X[self.tails, self.heads][:, None])
 
 class Log_Lex(Solver):
 
-    def __init__(self, problem, time_limit, username):
+    def __init__(self, problem, time_limit, username, **options):
         # Inherit from Solver
-        super().__init__(problem, time_limit, username)
+        super().__init__(problem, time_limit, username, **options)
 
     def formulation(self):
         # Sub-tour restrictions
-        l = int(np.ceil(np.log(len(list(self.problem.get_nodes()))))) + 1
+        l = int(np.ceil(np.log(self.n))) + 1
         self.z = {}
         self.p0 = {}
         self.p00 = {}
@@ -198,13 +535,16 @@ class Log_Lex(Solver):
         self.r11 = {}
         self.r10 = {}
         self.r01 = {}
+        # A pair whose two arcs were removed by the preprocessing has x[i,j] = x[j,i] = 0: its labels only have
+        # to be consistent with z, which is always possible, so its variables and restrictions are not added
+        kept = set(self.arcs)
         for i in self.problem.get_nodes():
             if i != 1:
                 for t in range(1, l + 1):
                     self.z[i, t] = self.model.addVar(vtype = GRB.CONTINUOUS, name = f"z[{i},{t}]")
         for i in self.problem.get_nodes():
             for j in self.problem.get_nodes():
-                if i < j and i != 1 and j != 1:
+                if i < j and i != 1 and j != 1 and ((i, j) in kept or (j, i) in kept):
                     self.p0[i, j] = self.model.addVar(vtype = GRB.CONTINUOUS, name = f"p0[{i},{j}]")
                     self.r0[i, j] = self.model.addVar(vtype = GRB.CONTINUOUS, name = f"r0[{i},{j}]")
                     for t in range(1, l + 1):
@@ -0,0 +1,90 @@
+# file that contains heuristics to find a good tour quickly, used as a starting solution (MIP start)
+# of the formulations (see Solver, warm_start). Every function works on the (n x n) distance matrix
+# and tours are arrays with the positions (0 to n - 1) of the nodes in the order they are visited
+
+import numpy as np
+
+def tour_cost(tour, distances):
+    # cost of a tour, including the arc from the last node to the first one
+    return distances[tour, np.roll(tour, - 1)].sum()
+
+def nearest_neighbour(distances, start = 0):
+    # builds a tour going always to the closest node not visited yet
+    n = len(distances)
+    visited = np.zeros(n, dtype = bool)
+    tour = np.zeros(n, dtype = int)
+    tour[0] = start
+    visited[start] = True
+    for k in range(1, n):
+        tour[k] = np.argmin(np.where(visited, np.inf, distances[tour[k - 1]]))
+        visited[tour[k]] = True
+    return tour
+
+def two_opt(tour, distances):
+    # best improvement 2-opt: replaces arcs (a, b), (c, d) by (a, c), (b, d) reversing the path b..c,
+    # while it improves the tour (the distances must be symmetric)
+    tour = tour.copy()
+    n = len(tour)
+    i, j = np.triu_indices(n, 2)
+    keep = ~((i == 0) & (j == n - 1)) # both arcs would share a node
+    i, j = i[keep], j[keep]
+    while len(i):
+        a, b, c, d = tour[i], tour[(i + 1) % n], tour[j], tour[(j + 1) % n]
+        delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+        best = np.argmin(delta)
+        if delta[best] > - 1e-9:
+            break
+        tour[i[best] + 1:j[best] + 1] = tour[i[best] + 1:j[best] + 1][::-1]
+    return tour
+
+def or_opt(tour, distances, lengths = (1, 2, 3)):
+    # best improvement Or-opt: moves a path of 1, 2 or 3 consecutive nodes (without reversing it)
+    # between two other consecutive nodes, while it improves the tour
+    tour = tour.copy()
+    n = len(tour)
+    while True:
+        best_delta, best_move = - 1e-9, None
+        for length in lengths:
+            if length > n - 3:
+                break
+            starts = np.arange(n)
+            first, last = tour[starts], tour[(starts + length - 1) % n]
+            previous, following = tour[starts - 1], tour[(starts + length) % n]
+            removal = distances[previous, first] + distances[last, following] - distances[previous, following]
+            # insertion between positions j and j + 1
+            j = np.arange(n)
+            c, d = tour[j], tour[(j + 1) % n]
+            insertion = distances[c[None, :], first[:, None]] + distances[last[:, None], d[None, :]] \
+                - distances[c, d][None, :]
+            # the arc (j, j + 1) can't touch the path: j inside the path or just before it
+            offset = (j[None, :] - starts[:, None]) % n
+            delta = np.where((offset < length) | (offset == n - 1), np.inf, insertion - removal[:, None])
+            start, position = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[start, position] < best_delta:
+                best_delta, best_move = delta[start, position], (start, position, length)
+        if best_move is None:
+            return tour
+        start, position, length = best_move
+        path = tour[(start + np.arange(length)) % n]
+        after = tour[position]
+        rest = tour[~np.isin(np.arange(n), (start + np.arange(length)) % n)]
+        k = int(np.flatnonzero(rest == after)[0])
+        tour = np.concatenate((rest[:k + 1], path, rest[k + 1:]))
+
+def heuristic_tour(distances, improve = True):
+    # returns a tour (positions) and its cost: nearest neighbour improved with 2-opt and Or-opt
+    # until neither improves it (2-opt only if the distances are symmetric)
+    distances = np.asarray(distances, dtype = float)
+    tour = nearest_neighbour(distances)
+    if improve and len(tour) > 3:
+        symmetric = np.array_equal(distances, distances.T)
+        cost = tour_cost(tour, distances)
+        while True:
+            if symmetric:
+                tour = two_opt(tour, distances)
+            tour = or_opt(tour, distances)
+            new_cost = tour_cost(tour, distances)
+            if new_cost >= cost - 1e-9:
+                break
+            cost = new_cost
+    return tour, tour_cost(tour, distances)
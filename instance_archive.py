@@ -0,0 +1,109 @@
+# file that generates many random instances at once and saves them in a single archive (.npy file)
+# The archive is memory-mapped: an instance is only read when it is used, and each instance of the
+# archive can be given directly to the Solver (same interface as a tsplib95 problem). Example:
+#   generate_archive('instances/uniform_15.npy', 1000, 15, seed = 1)
+#   for problem in InstanceArchive('instances/uniform_15.npy'):
+#       MTZ(problem, 60 * 10, 'javieragebhardt').solve()
+
+from functools import cached_property
+import numpy as np
+import os
+from distances import distance_matrix
+from generate_instance import write_tsp_file
+
+KINDS = ['uniform', 'clustered', 'grid']
+
+def generate_coordinates(count, num_nodes, kind = 'uniform', rng = None, low = - 30.0, high = 30.0):
+    # returns an array (count x num_nodes x 2) with the coordinates of count random instances
+    # receives:
+    # (1) count: number of instances
+    # (2) num_nodes: number of nodes of each instance
+    # (3) kind: 'uniform' (uniform in the square), 'clustered' (normal around num_nodes / 10 uniform centers)
+    #           or 'grid' (points of a regular grid moved at most half a cell)
+    # (4) rng: NumPy random generator
+    # (5) low, high: range of the coordinates
+    rng = rng if rng is not None else np.random.default_rng()
+    if kind == 'uniform':
+        coordinates = rng.uniform(low, high, (count, num_nodes, 2))
+    elif kind == 'clustered':
+        clusters = max(1, num_nodes // 10)
+        centers = rng.uniform(low, high, (count, clusters, 2))
+        assignment = rng.integers(0, clusters, (count, num_nodes))
+        coordinates = np.take_along_axis(centers, assignment[:, :, None], axis = 1) \
+            + rng.normal(0, (high - low) / 20, (count, num_nodes, 2))
+    elif kind == 'grid':
+        side = int(np.ceil(np.sqrt(num_nodes)))
+        cell = (high - low) / side
+        # num_nodes different cells of the grid for every instance
+        cells = np.argsort(rng.random((count, side * side)), axis = 1)[:, :num_nodes]
+        coordinates = low + cell * (np.stack((cells // side, cells % side), axis = 2) + 0.5) \
+            + rng.uniform(- cell / 2, cell / 2, (count, num_nodes, 2))
+    else:
+        raise ValueError(f'kind must be one of {KINDS}, not {kind!r}')
+    return np.round(np.clip(coordinates, low, high), 2)
+
+def generate_archive(path, count, num_nodes, kind = 'uniform', seed = None, edge_weight_type = 'GEO', low = - 30.0, high = 30.0):
+    # generates count instances of num_nodes nodes and saves them in the archive path (.npy)
+    # the same seed (and count, num_nodes and kind) always generates the same instances
+    coordinates = generate_coordinates(count, num_nodes, kind, np.random.default_rng(seed), low, high)
+    data = np.zeros(count, dtype = [('coords', 'f8', (num_nodes, 2)), ('kind', 'U9'), ('edge_weight_type', 'U8')])
+    data['coords'] = coordinates
+    data['kind'] = kind
+    data['edge_weight_type'] = edge_weight_type
+    np.save(path, data)
+    return InstanceArchive(path)
+
+class InstanceArchive:
+    # Instances saved by generate_archive, receives:
+    #  (1) path of the archive
+    # archive[k] is the instance k (0 to len(archive) - 1) and iterating goes through all of them
+    def __init__(self, path):
+        self.path = path
+        self.data = np.load(path, mmap_mode = 'r')
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.data):
+            raise IndexError(f'{self.path} has {len(self.data)} instances')
+        return ArchiveInstance(self, index)
+
+    def __iter__(self):
+        return (ArchiveInstance(self, index) for index in range(len(self.data)))
+
+class ArchiveInstance:
+    # Instance of an archive with the methods of a tsplib95 problem used by the Solver.
+    # Its name is 'archive_k' (k = index + 1), for example 'instances/uniform_15_1'
+    def __init__(self, archive, index):
+        self.archive = archive
+        self.index = index
+        self.name = f'{os.path.splitext(archive.path)[0]}_{index + 1}'
+        self.dimension = archive.data.dtype['coords'].shape[0]
+        self.edge_weight_type = str(archive.data['edge_weight_type'][index])
+        self.distances = None
+
+    @property
+    def coordinates(self):
+        # (n x 2) array with the coordinates, read from the archive
+        return np.asarray(self.archive.data['coords'][self.index])
+
+    @cached_property
+    def node_coords(self):
+        # dictionary {node: [x, y]} as in tsplib95, built once (distances.py reads coordinates directly)
+        return {node: list(coordinate) for node, coordinate in enumerate(self.coordinates.tolist(), start = 1)}
+
+    def get_nodes(self):
+        return iter(range(1, self.dimension + 1))
+
+    def get_edges(self):
+        return ((i, j) for i in range(1, self.dimension + 1) for j in range(1, self.dimension + 1))
+
+    def get_weight(self, start, end):
+        if self.distances is None:
+            self.distances = distance_matrix(self)
+        return self.distances[start - 1, end - 1]
+
+def export_tsp(instance, filename):
+    # writes an instance of an archive in TSPLIB format
+    write_tsp_file(filename, instance.coordinates.tolist(), instance.edge_weight_type)
@@ -0,0 +1,85 @@
+# file that measures the time of each phase of a Solver (building and solving the model),
+# the peak memory of the run and, optionally, profiles the formulation() of a Solver
+
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILERS = [None, 'cprofile', 'tracemalloc']
+
+def reset_peak_rss():
+    # resets the maximum resident memory of the process to the current one (Linux), so that the peak of
+    # every run is measured and not the peak of the whole process (workers of runner.py solve many runs).
+    # Returns False if it can't be reset
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        return False
+    return True
+
+def peak_rss():
+    # maximum resident memory (MB) of the process since the last reset_peak_rss, None if it can't be measured
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 2 ** 10 # kilobytes
+    except OSError:
+        pass
+    return None
+
+class Instrumentation:
+    # Times of the phases of a run, receives:
+    #  (1) profile: profiler used around formulation(): None, 'cprofile' (the statistics are saved
+    #      in profile_file, open them with pstats) or 'tracemalloc' (peak memory allocated by Python)
+    #  (2) profile_file: file where the cProfile statistics are saved
+    def __init__(self, profile = None, profile_file = None):
+        if profile not in PROFILERS:
+            raise ValueError(f'profile must be one of {PROFILERS}, not {profile!r}')
+        self.profile = profile
+        self.profile_file = profile_file
+        self.times = {}
+        self.formulation_memory = None
+        # peak memory of this run only, not measured where the peak of the process can't be reset
+        self.measure_memory = reset_peak_rss()
+
+    @contextmanager
+    def phase(self, name):
+        # measures the time of the code inside the with, added to the time of the phase name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0) + time.perf_counter() - start
+
+    @contextmanager
+    def profiled(self):
+        # runs the profiler (if any) on the code inside the with
+        if self.profile == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                os.makedirs(os.path.dirname(self.profile_file) or '.', exist_ok = True)
+                profiler.dump_stats(self.profile_file)
+        elif self.profile == 'tracemalloc':
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                self.formulation_memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+        else:
+            yield
+
+    def results(self):
+        # values saved with the run: time_<phase> of every phase, peak_rss (from the creation of the
+        # Instrumentation, Gurobi included) and formulation_memory (MB)
+        results = {f'time_{name}': value for name, value in self.times.items()}
+        results.update(peak_rss = peak_rss() if self.measure_memory else None, formulation_memory = self.formulation_memory)
+        return results
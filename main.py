@@ -1,14 +1,19 @@
 # file that exemplifies the use of the code
 # IMPORTANT: You must install tsplib95 and gurobi to use this code
 
-from formulations import DFJ, MTZ, Single_Commodity, Multi_Commodity, Log_Lex  # add formulations here if necessary
-from tsplib95 import load
+from formulations import DFJ, DFJ_Lazy, MTZ, Single_Commodity, Multi_Commodity, Log_Lex  # add formulations here if necessary
+from distances import load_problem
 from generate_instance import generate_tsp_file
-from process_data import data_by_formulation, average_execution_time, generate_graphic
+from instance_archive import generate_archive
+from process_data import data_by_formulation, average_execution_time, generate_graphic, generate_gap_graphic, generate_integral_graphic
+from results_store import import_text_results
+from portfolio import solve_portfolio
+from analytics import load_results, group_statistics, plot_all, build_and_solve
 
 def create_problem_from_file(filename):
     # creates a problem from a file in TSPLIB format
-    problem = load(filename)
+    # its distance matrix is cached next to the file and shared by all the formulations
+    problem = load_problem(filename)
     return problem
 
 # Example: creating random instances
@@ -18,7 +23,12 @@ for i in [5, 10, 15]:
         name = f'instances/{i}_{j}.tsp' # modify to change the directory where the instances are saved
         generate_tsp_file(name, i)
 
+# Example: creating 1000 instances of 15 nodes in a single archive, without writing .tsp files
+# archive = generate_archive('instances/uniform_15.npy', 1000, 15, kind = 'uniform', seed = 1)
+# MTZ(archive[0], 60 * 10, 'javieragebhardt').solve()
+
 # Example: solving random instances with different formulations
+# The results are saved in the database results.db (see results_store.py)
 for i in [5, 10, 15]:
     for j in range(1, 6):
         name = f'instances/{i}_{j}.tsp'
@@ -33,19 +43,63 @@ for i in [5, 10, 15]:
         model4.solve()
         model5 = Log_Lex(problem, 60 * 10, 'javieragebhardt')
         model5.solve()
+        # DFJ adding the sub-tour restrictions on the fly, usable for larger instances
+        model6 = DFJ_Lazy(problem, 60 * 10, 'javieragebhardt')
+        model6.solve()
+        # MTZ starting from a heuristic tour (warm_start, off by default to compare formulations fairly)
+        # Runs with options that change the run are saved and compared as another formulation: 'MTZ+warm_start',
+        # 'MTZ+trajectory' (model9) and 'MTZ+candidates5+fix_arcs' (model10), see results_store.configuration_label
+        model7 = MTZ(problem, 60 * 10, 'javieragebhardt', warm_start = True)
+        model7.solve()
+        # DFJ saving the built model in the folder models, later runs load it instead of building it
+        model8 = DFJ(problem, 60 * 10, 'javieragebhardt', cache = 'models')
+        model8.solve()
+        # MTZ without log file, sampling the incumbent and best bound every second (trajectory.py)
+        model9 = MTZ(problem, 60 * 10, 'javieragebhardt', log = False, trajectory = 1)
+        model9.solve()
+        # MTZ over the arcs to the 5 nearest neighbours of every node that reduced cost fixing doesn't remove
+        model10 = MTZ(problem, 60 * 10, 'javieragebhardt', candidates = 5, fix_arcs = True)
+        model10.solve()
+
 
+# Example: solving an instance with several formulations at the same time, stopping at the first proof of optimality
+# result = solve_portfolio('instances/15_1.tsp', ['DFJ_Lazy', 'MTZ', 'Single_Commodity'], 60 * 10, 'javieragebhardt')
+# print(result['formulation'], result['objective'], result['tour'], result['times'])
+
+# Example: adding the results of the old text files (results_no_relaxed.txt, results_relaxed.txt) to the database
+# import_text_results('results.db', 'results_no_relaxed.txt', 'results_relaxed.txt')
 
 # Example: calculating average execution time of a formulation (in this case MTZ) for a given number of nodes
 for i in [5, 10, 15]:
-    average_no_relaxed = average_execution_time(data_by_formulation('results_no_relaxed.txt')['MTZ'], i)
-    average_relaxed = average_execution_time(data_by_formulation('results_relaxed.txt')['MTZ'], i)
+    average_no_relaxed = average_execution_time(data_by_formulation('results.db')['MTZ'], i)
+    average_relaxed = average_execution_time(data_by_formulation('results.db', relaxed = True)['MTZ'], i)
     print(f'Average execution time of MTZ for {i} nodes (no relaxed): {average_no_relaxed}')
     print(f'Average execution time of MTZ for {i} nodes (relaxed): {average_relaxed}')
 
 # Example: generating a graphic comparing two formulations Relaxed Objective Value
-# In this case Log_Lex and MTZ for 5, 10 and 15 nodes, remember to adjust x and y limits
-generate_graphic('results_relaxed.txt', 'Log_Lex', 'MTZ', 3, [5, 10, 15])
+# In this case Log_Lex and MTZ for 5, 10 and 15 nodes
+generate_graphic('results.db', 'Log_Lex', 'MTZ', 'obj_val_relaxed', [5, 10, 15])
 
 # Example: generating a graphic comparing two formulations Execution Time
-# In this case Log_Lex and MTZ for 5, 10 and 15 nodes, remember to adjust x and y limits
-generate_graphic('results_no_relaxed.txt', 'Log_Lex', 'MTZ', 7, [5, 10, 15])
\ No newline at end of file
+# In this case Log_Lex and MTZ for 5, 10 and 15 nodes, in logarithmic scale
+generate_graphic('results.db', 'Log_Lex', 'MTZ', 'exec_time', [5, 10, 15], log = True)
+
+# Example: generating a graphic comparing MTZ with and without warm start (model7)
+generate_graphic('results.db', 'MTZ', 'MTZ+warm_start', 'exec_time', [5, 10, 15], log = True)
+
+# Example: statistics of the execution time of every formulation and number of nodes
+# and graphs comparing every pair of formulations and performance profiles
+results = load_results('results.db')
+for row in group_statistics(results, 'exec_time', time_limit = 60 * 10):
+    print(row)
+plot_all(results, time_limit = 60 * 10)
+
+# Example: mean time building and solving the models of every formulation and number of nodes
+# (formulations with a large build_fraction are limited by the construction of the model)
+for row in build_and_solve(results):
+    print(row)
+
+# Example: gap over time of every formulation on one instance and mean primal-dual integrals
+# (runs solved with trajectory, like model9)
+generate_gap_graphic('results.db', 'instances/15_1.tsp', log = True)
+generate_integral_graphic('results.db', time_limit = 60 * 10)
@@ -0,0 +1,105 @@
+# file that saves the models built by the formulations on disk and loads them in later runs
+# A model is saved (MPS file + JSON index) the first time a formulation is built for an instance, and
+# the next Solver of the same formulation and instance reads it instead of building it again (only the
+# time limit or the parameters change between sweeps). The key of a model includes a hash of the code
+# of the formulation, so a model is built again when the formulation changes. Example:
+#   MTZ(problem, 60 * 10, 'javieragebhardt', cache = 'models').solve()
+
+import gurobipy as gp
+import hashlib
+import inspect
+import json
+import numpy as np
+import os
+from distances import content_key
+
+MAX_CACHE_BYTES = 2 * 2 ** 30 # the least recently used models are deleted above this size
+
+def formulation_version(formulation):
+    # hash of the source code of a formulation class and the classes it inherits from (Solver included)
+    version = hashlib.sha1()
+    for cls in formulation.__mro__:
+        if cls is not object:
+            version.update(inspect.getsource(cls).encode())
+    return version.hexdigest()
+
+def model_key(solver):
+    # name of the cached model of a Solver: formulation, instance content, formulation version and
+    # construction (vectorized or not and preprocessing, the models can be different)
+    construction = 'vectorized' if solver.vectorized else 'generators'
+    # arcs kept by the preprocessing: the hash of the arcs changes if heuristics.py or preprocessing.py
+    # keep other arcs for the same options
+    if solver.candidates is not None:
+        construction += f'_candidates{solver.candidates}'
+    if solver.fix_arcs:
+        construction += '_fixed'
+    if solver.candidates is not None or solver.fix_arcs:
+        arcs = hashlib.sha1(np.ascontiguousarray(solver.tails, dtype = np.int64).tobytes())
+        arcs.update(np.ascontiguousarray(solver.heads, dtype = np.int64).tobytes())
+        construction += f'_{arcs.hexdigest()[:12]}'
+    return f'{solver.formulation_name}_{content_key(solver.problem)[:16]}_{formulation_version(type(solver))[:12]}_{construction}'
+
+class ModelCache:
+    # Directory with the cached models, receives:
+    #  (1) directory: folder of the models, created if it doesn't exist
+    #  (2) max_bytes: maximum size of the models saved
+    # Every model is saved as 'key.mps' (variables, restrictions and objective) and 'key.json' (index
+    # of the x variables and size of the model), the JSON file is written last
+    def __init__(self, directory, max_bytes = MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok = True)
+
+    def paths(self, key):
+        return os.path.join(self.directory, f'{key}.mps'), os.path.join(self.directory, f'{key}.json')
+
+    def load(self, key, env):
+        # returns (model, index) of a cached model, or None if it is not saved or it is not complete
+        model_path, index_path = self.paths(key)
+        try:
+            with open(index_path) as file:
+                index = json.load(file)
+            model = gp.read(model_path, env)
+        except (OSError, ValueError, gp.GurobiError):
+            return None
+        if [model.NumVars, model.NumConstrs, model.NumNZs] != [index['num_vars'], index['num_constrs'], index['num_nzs']]:
+            model.dispose()
+            return None
+        # used recently: the last model to be deleted
+        for path in self.paths(key):
+            os.utime(path)
+        return model, index
+
+    def save(self, key, model, index):
+        # saves a model (already updated) and its index, written to temporary files first so that
+        # other processes never read half a model
+        model_path, index_path = self.paths(key)
+        index = dict(index, num_vars = model.NumVars, num_constrs = model.NumConstrs, num_nzs = model.NumNZs)
+        temporary = os.path.join(self.directory, f'{key}.{os.getpid()}.tmp.mps')
+        model.write(temporary)
+        os.replace(temporary, model_path)
+        temporary = f'{index_path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(index, file)
+        os.replace(temporary, index_path)
+        self.evict()
+
+    def evict(self):
+        # deletes the least recently used models until the cache fits in max_bytes
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.mps') and '.tmp' not in name]
+        entries = []
+        for model_path in files:
+            try:
+                entries.append((os.path.getmtime(model_path), os.path.getsize(model_path), model_path))
+            except OSError: # deleted by another process
+                pass
+        total = sum(size for _, size, _ in entries)
+        for _, size, model_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (model_path, model_path[:- len('.mps')] + '.json'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
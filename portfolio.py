@@ -0,0 +1,195 @@
+# file that races several formulations on the same instance, one process each, and stops all of them as
+# soon as one proves optimality or the deadline expires (portfolio). The processes share their tours: a
+# better tour found by one formulation is given to the others as a solution (see PortfolioCallback).
+# Every formulation saves its run in the results database as usual (stopped runs with status INTERRUPTED).
+# Example:
+#   result = solve_portfolio('instances/15_1.tsp', ['DFJ_Lazy', 'MTZ', 'Single_Commodity'], 60, 'javieragebhardt')
+#   print(result['formulation'], result['objective'], result['tour'], result['times'])
+# or from the command line:
+#   python portfolio.py instances/15_1.tsp --formulations DFJ_Lazy MTZ Single_Commodity --deadline 60
+
+import argparse
+import multiprocessing
+import queue
+import time
+import numpy as np
+from gurobipy import GRB
+import formulations
+from formulations import create_env
+from runner import open_instance
+
+GRACE = 10 # seconds the formulations have to stop after the first proof or the deadline before being killed
+
+def tour_of(values, tails, heads, n):
+    # tour (positions of the nodes, starting at 0) given by the arcs (tails, heads) with value 1,
+    # None if they are not a single tour
+    successor = np.full(n, - 1)
+    chosen = values > 0.5
+    successor[tails[chosen]] = heads[chosen]
+    tour = [0]
+    while len(tour) < n and successor[tour[- 1]] > 0:
+        tour.append(successor[tour[- 1]])
+    if len(tour) < n or successor[tour[- 1]] != 0 or len(np.unique(tour)) < n:
+        return None
+    return np.array(tour)
+
+class SharedIncumbent:
+    # best tour found by the formulations of a portfolio, shared by their processes, receives:
+    #  (1) n: number of nodes
+    # done is set when the portfolio has to stop (proof of optimality or deadline)
+    def __init__(self, n):
+        self.lock = multiprocessing.Lock()
+        self.objective = multiprocessing.RawValue('d', np.inf)
+        self.tour = multiprocessing.RawArray('i', n)
+        self.owner = multiprocessing.RawValue('i', - 1) # formulation (position in the portfolio) that found it
+        self.version = multiprocessing.RawValue('i', 0) # number of tours published
+        self.done = multiprocessing.Event()
+
+    def publish(self, objective, tour, owner):
+        # saves a tour if it is better than the best one
+        with self.lock:
+            if objective < self.objective.value - 1e-6:
+                self.objective.value = objective
+                self.tour[:] = tour.tolist()
+                self.owner.value = owner
+                self.version.value += 1
+
+    def best(self):
+        # (version, objective, tour, owner) of the best tour
+        with self.lock:
+            return self.version.value, self.objective.value, np.array(self.tour[:]), self.owner.value
+
+class PortfolioCallback:
+    # Gurobi callback of a formulation in a portfolio, receives:
+    #  (1) solver: Solver of the formulation
+    #  (2) shared: SharedIncumbent of the portfolio
+    #  (3) owner: position of the formulation in the portfolio
+    # Publishes the new tours of the formulation, gives it the better tours of the others (only if all
+    # their arcs were kept by its preprocessing) and stops the optimization when the portfolio is done
+    def __init__(self, solver, shared, owner):
+        self.shared = shared
+        self.owner = owner
+        self.n, self.tails, self.heads = solver.n, solver.tails, solver.heads
+        self.arc_vars = [solver.x[i, j] for i, j in solver.arcs]
+        self.arcs = np.zeros((self.n, self.n), dtype = bool)
+        self.arcs[self.tails, self.heads] = True
+        self.seen = 0 # version of the last tour of the others that was considered
+
+    def __call__(self, model, where):
+        if self.shared.done.is_set():
+            model.terminate()
+        elif where == GRB.Callback.MIPSOL:
+            tour = tour_of(np.array(model.cbGetSolution(self.arc_vars)), self.tails, self.heads, self.n)
+            if tour is not None:
+                self.shared.publish(model.cbGet(GRB.Callback.MIPSOL_OBJ), tour, self.owner)
+        elif where == GRB.Callback.MIPNODE and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.OPTIMAL \
+                and self.shared.version.value != self.seen:
+            self.seen, objective, tour, _ = self.shared.best()
+            successors = np.roll(tour, - 1)
+            if objective < model.cbGet(GRB.Callback.MIPNODE_OBJBST) - 1e-6 and self.arcs[tour, successors].all():
+                chosen = np.zeros((self.n, self.n), dtype = bool)
+                chosen[tour, successors] = True
+                model.cbSetSolution(self.arc_vars, chosen[self.tails, self.heads].astype(float).tolist())
+                model.cbUseSolution()
+
+def race(instance, owner, formulation, time_limit, username, threads, options, shared, results):
+    # solves the instance with one formulation of the portfolio (in its own process) and puts in results
+    # (formulation, proved, objective, tour, time, error). proved is True if the tour is optimal
+    start = time.time()
+    proved, objective, tour, error = False, None, None, None
+    try:
+        env = create_env(username, {'LogToConsole': 0})
+        solver = getattr(formulations, formulation)(open_instance(instance), time_limit, username, env = env,
+                                                    threads = threads, **options)
+        callback = PortfolioCallback(solver, shared, owner)
+        solver.callbacks.append(callback)
+        solver.solve()
+        if solver.model.SolCount > 0:
+            objective = solver.model.ObjVal
+            tour = tour_of(np.array(solver.model.getAttr('X', callback.arc_vars)), solver.tails, solver.heads, solver.n)
+            # with preprocessing the solution has to be optimal on the complete graph too
+            proved = solver.model.Status == GRB.OPTIMAL and (solver.relaxation is None or solver.optimal_on_full_graph(objective))
+    except Exception as exception:
+        error = f'{type(exception).__name__}: {exception}'
+    if proved:
+        shared.done.set()
+    results.put((formulation, proved, objective, None if tour is None else tour.tolist(), time.time() - start, error))
+
+def solve_portfolio(instance, formulations_list, deadline, username, threads = 1, **options):
+    # solves an instance with several formulations at the same time and stops at the first proof of optimality
+    # receives:
+    # (1) instance: file of the instance in TSPLIB format or instance of an archive ('archive.npy#index')
+    # (2) formulations_list: list of different formulations (classes of formulations.py or their names)
+    # (3) deadline: maximum time of the whole portfolio in seconds
+    # (4) username of Gurobi
+    # (5) threads: threads of each formulation
+    # (6) options: other options of the Solver, by default only the original problem is solved (mode = 'mip')
+    # returns a dictionary with:
+    #   tour: nodes of the best tour in the order they are visited (None if no tour was found)
+    #   objective: cost of the tour
+    #   formulation: formulation that proved optimality first or, if none did, that found the tour
+    #   optimal: True if the tour was proved optimal before the deadline
+    #   times: seconds spent by each formulation
+    #   errors: error of each formulation that failed
+    names = [formulation if isinstance(formulation, str) else formulation.__name__ for formulation in formulations_list]
+    # the results are given by formulation: two processes of the same one can't be told apart
+    if len(set(names)) < len(names):
+        raise ValueError(f'formulations must be different, got {names}')
+    nodes = list(open_instance(instance).get_nodes())
+    shared = SharedIncumbent(len(nodes))
+    results = multiprocessing.Queue()
+    options.setdefault('mode', 'mip')
+    start = time.time()
+    processes = [multiprocessing.Process(target = race, args = (instance, owner, name, deadline, username, threads, options, shared, results))
+                 for owner, name in enumerate(names)]
+    for process in processes:
+        process.start()
+
+    finished = {}
+    winner = None
+    kill_time = None
+    while len(finished) < len(names):
+        if kill_time is None and (shared.done.is_set() or time.time() >= start + deadline):
+            # the formulations stop in their next callback, the ones that don't are killed after GRACE
+            shared.done.set()
+            kill_time = time.time() + GRACE
+        try:
+            run = results.get(timeout = max(0.01, (kill_time or start + deadline) - time.time()))
+        except queue.Empty:
+            if kill_time is not None and time.time() >= kill_time:
+                break
+            continue
+        finished[run[0]] = run
+        if run[1] and winner is None:
+            winner = run[0]
+    end = time.time() - start
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    if winner is not None:
+        _, _, objective, tour, _, _ = finished[winner]
+    else:
+        # best tour found (by a formulation that finished or was stopped)
+        _, objective, tour, owner = shared.best()
+        winner, tour = (names[owner], tour.tolist()) if owner >= 0 else (None, None)
+        objective = objective if owner >= 0 else None
+    return {'tour': None if tour is None else [nodes[k] for k in tour], 'objective': objective, 'formulation': winner,
+            'optimal': winner is not None and finished.get(winner, (None, False))[1],
+            'times': {name: finished[name][4] if name in finished else end for name in names},
+            'errors': {name: finished[name][5] for name in finished if finished[name][5] is not None}}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Solves an instance with several formulations at the same time')
+    parser.add_argument('instance', help = '.tsp file or instance of an archive (archive.npy#index)')
+    parser.add_argument('--formulations', nargs = '+', default = ['DFJ_Lazy', 'MTZ', 'Single_Commodity', 'Multi_Commodity', 'Log_Lex'])
+    parser.add_argument('--deadline', type = float, default = 60 * 10)
+    parser.add_argument('--username', default = None)
+    parser.add_argument('--threads', type = int, default = 1)
+    parser.add_argument('--results', default = 'results.db', help = 'results database')
+    args = parser.parse_args()
+    result = solve_portfolio(args.instance, args.formulations, args.deadline, args.username, args.threads, results = args.results)
+    print(f"{result['formulation']} {'optimal' if result['optimal'] else 'best'} tour, cost {result['objective']}: {result['tour']}")
+    for name, seconds in result['times'].items():
+        print(f'{name}: {seconds:.2f}s' + (f" ERROR {result['errors'][name]}" if name in result['errors'] else ''))
@@ -0,0 +1,83 @@
+# file that reduces the arcs of an instance before building a formulation (see Solver, candidates and fix_arcs)
+#  - candidate graph: only the arcs between near nodes (k nearest neighbours or Delaunay triangulation) are
+#    kept, plus the arcs of a heuristic tour so that there is always a tour. Optimal tours rarely use other
+#    arcs, but it is not guaranteed: the Solver checks the solution on the complete graph afterwards
+#  - reduced cost fixing: with the LP relaxation of DFJ on the complete graph (value z and reduced costs d)
+#    and the cost U of a heuristic tour, every tour that uses an arc a costs at least z + d[a], so the arcs
+#    with z + d[a] > U can't be in an optimal tour and are removed (exact)
+# Arcs are given as (n x n) boolean matrices over the positions (0 to n - 1) of the nodes
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import Delaunay, QhullError
+from separation import violated_subsets
+
+def incidence(ends, n):
+    # (n x arcs) sparse matrix with a 1 in row ends[a] of every arc a: incidence(tails, n) @ x sums the
+    # variables of the arcs that leave each node, incidence(heads, n) @ x the ones that enter it
+    return sp.csr_matrix((np.ones(len(ends)), (ends, np.arange(len(ends)))), shape = (n, len(ends)))
+
+def nearest_neighbour_arcs(distances, k):
+    # arcs (i, j) where j is one of the k nearest nodes of i or i is one of the k nearest nodes of j
+    n = len(distances)
+    k = min(k, n - 1)
+    distances = np.where(np.eye(n, dtype = bool), np.inf, distances)
+    nearest = np.argpartition(distances, k - 1, axis = 1)[:, :k]
+    arcs = np.zeros((n, n), dtype = bool)
+    arcs[np.repeat(np.arange(n), k), nearest.ravel()] = True
+    return arcs | arcs.T
+
+def delaunay_arcs(coordinates):
+    # arcs (both directions) of the Delaunay triangulation of the coordinates (n x 2), every arc if
+    # the points are too few or all on a line to triangulate them
+    n = len(coordinates)
+    arcs = ~np.eye(n, dtype = bool)
+    if n < 4:
+        return arcs
+    try:
+        triangles = Delaunay(coordinates).simplices
+    except QhullError:
+        return arcs
+    arcs = np.zeros((n, n), dtype = bool)
+    for a, b in [(0, 1), (1, 2), (0, 2)]:
+        arcs[triangles[:, a], triangles[:, b]] = True
+    return arcs | arcs.T
+
+def tour_arcs(tour, n):
+    # arcs (both directions) of a tour given by the positions of its nodes
+    arcs = np.zeros((n, n), dtype = bool)
+    arcs[tour, np.roll(tour, - 1)] = True
+    return arcs | arcs.T
+
+def subtour_relaxation(distances, env):
+    # solves the LP relaxation of DFJ on the complete graph (degree restrictions plus the violated
+    # sub-tour restrictions found by separation.py) and returns its value and the (n x n) matrix of
+    # reduced costs of the arcs (inf on the diagonal)
+    n = len(distances)
+    tails, heads = np.nonzero(~np.eye(n, dtype = bool))
+    model = gp.Model('subtour_relaxation', env = env)
+    model.setParam('OutputFlag', 0)
+    x = model.addMVar(len(tails), ub = 1, obj = distances[tails, heads])
+    model.addConstr(incidence(tails, n) @ x == 1)
+    model.addConstr(incidence(heads, n) @ x == 1)
+    while True:
+        model.optimize()
+        weights = np.zeros((n, n))
+        np.add.at(weights, (tails, heads), x.X)
+        weights += weights.T
+        subsets = violated_subsets(weights, False)
+        if not subsets:
+            break
+        for subset in subsets:
+            inside = np.isin(tails, subset) & np.isin(heads, subset)
+            model.addConstr(x[inside].sum() <= len(subset) - 1)
+    reduced_costs = np.full((n, n), np.inf)
+    reduced_costs[tails, heads] = x.RC
+    value = model.ObjVal
+    model.dispose()
+    return value, reduced_costs
+
+def reduced_cost_arcs(bound, reduced_costs, upper_bound, tolerance = 1e-6):
+    # arcs that can be in a tour of cost at most upper_bound: bound + reduced cost <= upper_bound
+    return bound + reduced_costs <= upper_bound + tolerance
@@ -1,19 +1,27 @@
 # file that process data
 
-import matplotlib.pyplot as plt
 import os
+from analytics import load_results, plot_comparison, plot_gap_over_time, plot_primal_dual_integrals
+from trajectory import load_trajectories
+from results_store import ResultsStore, NO_RELAXED, RELAXED, CONFIGURATION, configuration_label
 
-def data_by_formulation(file_path):
-    # reads the data from the file and returns a dictionary with the data separated by formulation
-    # receives the path to the file. Example: 'results.txt'
-    # could be use in relaxed or not relaxed data
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
+def data_by_formulation(file_path, relaxed = False):
+    # reads the data from the results database and returns a dictionary with the data separated by formulation
+    # receives:
+    # (1) file_path: path to the database. Example: 'results.db'
+    # (2) relaxed: False for not relaxed data, True for relaxed data
+    # runs with options that are not the default ones are separated as another formulation ('MTZ+warm_start',
+    # see results_store.configuration_label)
+    # each run is a tuple with the columns of the old results files:
+    #   Not Relaxed data: (0: formulation, 1: instance, 2: nodes, 3: status, 4: Objective Value, 5: Best Bound, 6: GAP, 7: Execution Time)
+    #   Relaxed data: (0: formulation, 1: instance, 2: nodes, 3: Objective Value Relaxed, 4: Execution Time)
+    columns = RELAXED if relaxed else NO_RELAXED
+    with ResultsStore(file_path) as store:
+        rows = store.query(columns + list(CONFIGURATION))
     data_by_formulation = {}
-    for line in lines:
-        line = line.strip()  
-        datos = line.split(',') 
-        formulation = datos[0]  
+    for row in rows:
+        datos = row[:len(columns)]
+        formulation = configuration_label(datos[0], *row[len(columns):])
         if formulation not in data_by_formulation:
             data_by_formulation[formulation] = []  
         data_by_formulation[formulation].append(datos)  
@@ -26,57 +34,49 @@ def average_execution_time(data, nodes):
     #                                            formulation has to be equal as in the file
     # (3) nodes: number of nodes 
     # could be use in relaxed or not relaxed data
-    average_time = 0
-    for dato in data:
-        if dato[2] == str(nodes):
-            average_time += float(dato[-1].strip(';'))
-    return average_time/nodes
+    # runs without the time (solved only in the other mode, see Solver) are not counted, returns 0 if there are none
+    # (analytics.group_statistics computes this and more statistics for every formulation at once)
+    times = [dato[-1] for dato in data if dato[2] == nodes and dato[-1] is not None]
+    if not times:
+        return 0
+    return sum(times)/len(times)
         
 
-def generate_graphic(file, formulation1, formulation2, comparison, nodes_comparing):
+def generate_graphic(file, formulation1, formulation2, comparison, nodes_comparing, log = False):
     # generates a graph comparing data of a formulation with data of another formulation 
     # receives:
-    # (1) file: file with the data to be compared 
+    # (1) file: results database with the data to be compared. Example: 'results.db'
     # (2) formulation1: formulation to be compared (name has to be equal as in the file)
     #                   goes on the x axis
     # (3) formulation2: formulation to be compared (name has to be equal as in the file)
     #                   goes on the y axis
-    # (4) comparison: position (int) of the comparison in the file 
-    #  Be careful with de type of data:
-    #                 Not Relaxed data: (3: status, 4: Objective Value, 5: Best Bound, 6: GAP, 7: Execution Time)
-    #                 Relaxed data: (2: Objective Value Relaxed, 3: Execution Time)
+    # (4) comparison: column of the database to be compared
+    #                 Not Relaxed data: 'status', 'obj_val', 'best_bound', 'gap', 'exec_time'
+    #                 Relaxed data: 'obj_val_relaxed', 'exec_time_relaxed'
     # (5) nodes_comparing: list of nodes to be compared
-    data = data_by_formulation(file)
-    data_formulation1 = data[formulation1]
-    data_formulation2 = data[formulation2]
-    # If you want logaritmic scale, just do this:
-    # data_formulation1 = np.log10(data_formulation1)
-    # data_formulation2 = np.log10(data_formulation2)
-    for node in nodes_comparing:
-        exec(f"data_formulation_1_{node} = []")
-        exec(f"data_formulation_2_{node} = []")
-    for instance in data_formulation1:
-        for node in nodes_comparing:
-            if instance[2] == str(node):
-                eval(f"data_formulation_1_{node}").append(float(instance[comparison]))
-    for instance in data_formulation2:
-        for node in nodes_comparing:
-            if instance[2] == str(node):
-                eval(f"data_formulation_2_{node}").append(float(instance[comparison]))
-    for node in nodes_comparing:
-        plt.scatter(eval(f'data_formulation_1_{node}'), eval(f'data_formulation_2_{node}'), 
-                    marker='*', label=f'{node} nodes')
-    plt.plot([-1000000000, 1000000000], [-1000000000, 1000000000], color='red', linewidth=1) # y = x line
-    plt.xlabel(f'{formulation1}')
-    plt.ylabel(f'{formulation2}')
-    plt.legend()
-    plt.title(f'{formulation1} vs {formulation2}')
-    plt.axis('equal')
-    plt.xlim(0, 30000)  # Adjust x axis limits
-    plt.ylim(0, 30000)  # Adjust y axis limits 
+    # (6) log: True for logarithmic scale
+    # The axis limits are taken from the data. The graph is saved in graphs as
+    # 'formulation1_formulation2_comparison.pdf' (it overwrites the previous file)
+    # To generate the graphs of every pair of formulations at once use analytics.plot_all
+    path = os.path.join(os.getcwd(), 'graphs') # Change path where you want to save the graph
+    plot_comparison(load_results(file), formulation1, formulation2, comparison, nodes_comparing, path, log)
+
+def generate_gap_graphic(file, instance, log = False):
+    # generates a graph with the gap over time of every formulation that solved an instance
+    # receives:
+    # (1) file: results database with the runs (solved with trajectory, see Solver). Example: 'results.db'
+    # (2) instance: name of the instance as in the file. Example: 'instances/15_1.tsp'
+    # (3) log: True for logarithmic scale of the time
+    # The graph is saved in graphs as 'gap_instance.pdf'
+    path = os.path.join(os.getcwd(), 'graphs') # Change path where you want to save the graph
+    plot_gap_over_time(load_trajectories(file, instance = instance), instance, path, log)
+
+def generate_integral_graphic(file, time_limit = None):
+    # generates a graph with the mean primal-dual integral of every formulation for every number of nodes
+    # receives:
+    # (1) file: results database with the runs (solved with trajectory, see Solver). Example: 'results.db'
+    # (2) time_limit: time limit of the runs in seconds, the integral is computed until it (until the
+    #                 end of every run if None)
+    # The graph is saved in graphs as 'primal_dual_integral.pdf'
     path = os.path.join(os.getcwd(), 'graphs') # Change path where you want to save the graph
-    file_name = f'{formulation1}_{formulation2}_{comparison}.pdf' # Change name of the file if necessary
-    # Be carefull with the name of the file, if you don't change it, it will overwrite the previous file
-    # plt.show() # Show the image, comment if you don't want to show it
-    plt.savefig(os.path.join(path, file_name), 
-                format='pdf') # Save the image in pdf format, change if necessary
\ No newline at end of file
+    plot_primal_dual_integrals(load_trajectories(file), time_limit, path)
@@ -0,0 +1,190 @@
+# file that stores the results of the Solver class in a SQLite database
+# Every run is one row of the table runs. Several processes can add runs to the same
+# database at the same time (see runner.py). Example:
+#   with ResultsStore('results.db') as store:
+#       store.query(NO_RELAXED, formulation = 'MTZ', nodes = 10)
+
+import json
+import sqlite3
+import time
+
+# columns of the table runs and their types
+COLUMNS = {
+    'formulation': 'TEXT NOT NULL',
+    'instance': 'TEXT NOT NULL',
+    'nodes': 'INTEGER NOT NULL',
+    'mode': 'TEXT', # 'lp', 'lp_mip' or 'mip' (see Solver)
+    'num_vars': 'INTEGER', # size of the model built by the formulation
+    'num_constrs': 'INTEGER',
+    'num_nzs': 'INTEGER',
+    'num_arcs': 'INTEGER', # arcs kept by the preprocessing (see preprocessing.py)
+    'status': 'INTEGER',
+    'obj_val': 'REAL',
+    'best_bound': 'REAL',
+    'gap': 'REAL',
+    'exec_time': 'REAL',
+    'obj_val_relaxed': 'REAL',
+    'exec_time_relaxed': 'REAL',
+    'wall_time': 'REAL', # wall time of the phases (original and relaxed), exec_time is Gurobi's runtime
+    'wall_time_relaxed': 'REAL',
+    'heuristic_obj': 'REAL', # cost of the starting tour (warm_start), NULL without it
+    'heuristic_time': 'REAL',
+    'time_env': 'REAL', # wall time of the phases of the build (see instrumentation.py)
+    'time_init': 'REAL', # variables, degree constraints and objective (Solver)
+    'time_formulation': 'REAL',
+    'time_update': 'REAL',
+    'time_relax': 'REAL', # change of the integer variables to continuous and back
+    'peak_rss': 'REAL', # peak resident memory of the process during the run (MB), Linux only
+    'formulation_memory': 'REAL', # peak memory allocated by formulation() (MB), profile = 'tracemalloc' only
+    'time_cache': 'REAL', # loading or saving the model in the model cache (see model_cache.py)
+    'model_cached': 'INTEGER', # 1 if the model was loaded from the model cache
+    'time_preprocess': 'REAL',
+    'full_graph_optimal': 'INTEGER', # 1 if the solution is proved optimal on the complete graph (preprocessing)
+    'trajectory': 'BLOB', # samples of the incumbent and best bound over time (see trajectory.py)
+    'vectorized': 'INTEGER', # options of the Solver that change the run (see CONFIGURATION), NULL in older runs
+    'warm_start': 'INTEGER',
+    'candidates': 'TEXT',
+    'fix_arcs': 'INTEGER',
+    'trajectory_interval': 'REAL', # seconds between samples of the trajectory, NULL without it
+    'extra': 'TEXT', # formulation specific results (JSON), see Solver.results_extra
+    'created': 'REAL',
+}
+
+# columns in the same order as the old results files
+NO_RELAXED = ['formulation', 'instance', 'nodes', 'status', 'obj_val', 'best_bound', 'gap', 'exec_time']
+RELAXED = ['formulation', 'instance', 'nodes', 'obj_val_relaxed', 'exec_time_relaxed']
+
+# columns filled by each mode (see Solver): a run of a mode is only solved if they are not NULL
+MODE_COLUMNS = {'lp': ['exec_time_relaxed'], 'mip': ['exec_time'], 'lp_mip': ['exec_time_relaxed', 'exec_time']}
+
+# columns with the options of the Solver that change a run and their values when the option is not given
+# (older runs have NULL): runs with different options are not compared or averaged together
+CONFIGURATION = {'vectorized': 1, 'warm_start': 0, 'candidates': None, 'fix_arcs': 0, 'trajectory_interval': None}
+
+RUN_OPTIONS = ['vectorized', 'warm_start', 'candidates', 'fix_arcs', 'trajectory'] # options of the Solver saved in them
+
+def configuration(vectorized = True, warm_start = False, candidates = None, fix_arcs = False, trajectory = None):
+    # values of the CONFIGURATION columns of a run with the given options of the Solver
+    return {'vectorized': int(vectorized), 'warm_start': int(warm_start), 'candidates': None if candidates is None else str(candidates),
+            'fix_arcs': int(fix_arcs), 'trajectory_interval': trajectory}
+
+def configuration_label(formulation, vectorized = None, warm_start = None, candidates = None, fix_arcs = None,
+                        trajectory_interval = None):
+    # name of a formulation followed by the options of a run that are not the default ones, missing values
+    # (NULL, or -1, '' and NaN in analytics.load_results) are the default ones. Example: 'MTZ', 'MTZ+warm_start',
+    # 'MTZ+candidates5+fix_arcs', 'Multi_Commodity+generators'
+    def given(value):
+        return value is not None and value != - 1 and value != '' and value == value
+    options = []
+    if given(vectorized) and not vectorized:
+        options.append('generators')
+    if given(warm_start) and warm_start:
+        options.append('warm_start')
+    if given(candidates):
+        options.append(f'candidates{candidates}')
+    if given(fix_arcs) and fix_arcs:
+        options.append('fix_arcs')
+    if given(trajectory_interval):
+        options.append('trajectory')
+    return '+'.join([str(formulation)] + options)
+
+INDEXES = [['formulation'], ['instance'], ['nodes'], ['formulation', 'nodes']]
+
+class ResultsStore:
+    # Database of results, receives:
+    #  (1) path of the database, it is created if it doesn't exist
+    def __init__(self, path = 'results.db'):
+        self.path = path
+        # the timeout makes concurrent writers wait for the lock instead of failing
+        self.connection = sqlite3.connect(path, timeout = 60)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        columns = ', '.join(f'{column} {kind}' for column, kind in COLUMNS.items())
+        with self.connection:
+            # the table, its columns and indexes are checked and changed holding the write lock, so that
+            # processes opening the database at the same time don't add the same column twice
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, {columns})')
+            # columns added after the database was created
+            existing = {row[1] for row in self.connection.execute('PRAGMA table_info(runs)')}
+            for column, kind in COLUMNS.items():
+                if column not in existing:
+                    self.connection.execute(f'ALTER TABLE runs ADD COLUMN {column} {kind.replace(" NOT NULL", "")}')
+            for index in INDEXES:
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS runs_{"_".join(index)} ON runs ({", ".join(index)})')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, formulation, instance, nodes, extra = None, **values):
+        # adds a run, values are the other columns of COLUMNS (missing ones are NULL)
+        # extra: dictionary with formulation specific results
+        unknown = set(values) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f'unknown columns: {sorted(unknown)}')
+        values.update(formulation = formulation, instance = instance, nodes = nodes, created = time.time())
+        if extra:
+            values['extra'] = json.dumps(extra)
+        columns = list(values)
+        with self.connection:
+            self.connection.execute(f'INSERT INTO runs ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                                    [values[column] for column in columns])
+
+    def query(self, columns = NO_RELAXED, formulation = None, instance = None, nodes = None):
+        # returns a list of tuples with the given columns of the runs that match the filters
+        # (formulation, instance and nodes can be a value or a list of values), in the order they were added
+        unknown = set(columns) - set(COLUMNS) - {'id'}
+        if unknown:
+            raise ValueError(f'unknown columns: {sorted(unknown)}')
+        conditions, parameters = [], []
+        for column, value in [('formulation', formulation), ('instance', instance), ('nodes', nodes)]:
+            if value is None:
+                continue
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+            parameters += values
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return self.connection.execute(f'SELECT {", ".join(columns)} FROM runs{where} ORDER BY id', parameters).fetchall()
+
+    def extra(self, formulation = None, instance = None, nodes = None):
+        # returns the formulation specific results (dictionaries) of the runs that match the filters
+        return [json.loads(row[0]) if row[0] else {} for row in self.query(['extra'], formulation, instance, nodes)]
+
+    def formulations(self):
+        # returns the names of the formulations in the database
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT formulation FROM runs ORDER BY formulation')]
+
+    def solved_runs(self, mode = 'lp_mip', **options):
+        # returns the set of (formulation, instance) already solved in a mode: runs with every column of
+        # MODE_COLUMNS[mode] (an 'lp_mip' run also solves 'lp' and 'mip', two runs in 'lp' and 'mip' don't solve 'lp_mip')
+        # options: options of the Solver of the runs (see configuration), runs with other options are not solved
+        conditions = [f'{column} IS NOT NULL' for column in MODE_COLUMNS[mode]]
+        parameters = []
+        for column, value in configuration(**options).items():
+            if column == 'trajectory_interval':
+                # any interval: only runs with a trajectory have one
+                conditions.append(f'trajectory_interval IS {"NOT " if value is not None else ""}NULL')
+            else:
+                conditions.append(f'COALESCE({column}, ?) IS ?')
+                parameters += [CONFIGURATION[column], value]
+        return set(self.connection.execute(f'SELECT DISTINCT formulation, instance FROM runs WHERE {" AND ".join(conditions)}', parameters))
+
+def import_text_results(path, file_no_relaxed = 'results_no_relaxed.txt', file_relaxed = 'results_relaxed.txt'):
+    # adds the runs of the old comma-separated results files to the database in path
+    # line k of both files belongs to the same run
+    with open(file_no_relaxed, 'r') as file:
+        lines_no_relaxed = [line.strip().split(',') for line in file if line.strip()]
+    with open(file_relaxed, 'r') as file:
+        lines_relaxed = [line.strip().split(',') for line in file if line.strip()]
+    with ResultsStore(path) as store:
+        for datos, datos_relaxed in zip(lines_no_relaxed, lines_relaxed):
+            if datos[:3] != datos_relaxed[:3]:
+                raise ValueError(f'results files do not match: {datos[:3]} and {datos_relaxed[:3]}')
+            store.add_run(datos[0], datos[1], int(datos[2]), status = int(datos[3]), obj_val = float(datos[4]),
+                          best_bound = float(datos[5]), gap = float(datos[6]), exec_time = float(datos[7]),
+                          obj_val_relaxed = float(datos_relaxed[3]), exec_time_relaxed = float(datos_relaxed[4]))
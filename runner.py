@@ -0,0 +1,122 @@
+# file that solves a list of instances with a list of formulations in parallel
+# Each worker process keeps one Gurobi environment for all the models it solves.
+# Example (from the command line):
+#   python runner.py instances/*.tsp --formulations DFJ MTZ Log_Lex --time-limit 600 --username javieragebhardt
+# or from python: run_batch(['instances/5_1.tsp'], [DFJ, MTZ], 600, 'javieragebhardt')
+# Archives of instances (.npy, see instance_archive.py) can be given instead of .tsp files
+
+import argparse
+import multiprocessing
+import os
+import time
+import formulations
+from formulations import create_env
+from distances import load_problem
+from instance_archive import InstanceArchive
+from results_store import ResultsStore, RUN_OPTIONS
+from tsplib95 import load
+
+_env = None # Gurobi environment of the worker process
+
+def start_worker(username, memory_limit):
+    # creates the Gurobi environment of a worker process
+    # memory_limit: maximum memory (GB) of the worker, None for no limit
+    global _env
+    params = {'LogToConsole': 0}
+    if memory_limit is not None:
+        params['MemLimit'] = memory_limit
+    _env = create_env(username, params)
+
+def instances_of(filename):
+    # returns a list with (instance, name of the problem) of a file: one for a .tsp file and
+    # one for each instance of an archive (.npy), given as 'archive.npy#index'
+    if filename.endswith('.npy'):
+        return [(f'{filename}#{instance.index}', instance.name) for instance in InstanceArchive(filename)]
+    return [(filename, load(filename).name)]
+
+def open_instance(instance):
+    # opens an instance given as in instances_of
+    if '#' in instance:
+        path, index = instance.rsplit('#', 1)
+        return InstanceArchive(path)[int(index)]
+    return load_problem(instance)
+
+def solve_task(task):
+    # solves one instance with one formulation in a worker, returns (file, formulation, error, time)
+    filename, formulation, time_limit, username, options = task
+    start = time.time()
+    try:
+        problem = open_instance(filename)
+        getattr(formulations, formulation)(problem, time_limit, username, env = _env, **options).solve()
+        error = None
+    except Exception as exception:
+        error = f'{type(exception).__name__}: {exception}'
+    return filename, formulation, error, time.time() - start
+
+def run_batch(instances, formulations_list, time_limit, username, workers = None, threads = 1, memory = None,
+              resume = True, results = 'results.db', **options):
+    # solves every instance with every formulation
+    # receives:
+    # (1) instances: list of files of the instances in TSPLIB format or archives of instances (.npy)
+    # (2) formulations_list: list of formulations (classes of formulations.py or their names)
+    # (3) time_limit: maximum time of execution of each model in seconds
+    # (4) username of Gurobi
+    # (5) workers: number of processes, by default as many as fit in the cores with the given threads
+    # (6) threads: threads of each model, workers * threads never exceeds the number of cores
+    # (7) memory: total memory (GB) shared by all the workers, None for no limit
+    # (8) resume: skips the runs that are already in the results database (solved in the same mode and with the same options)
+    # (9) results: path of the results database (see results_store.py)
+    # (10) options: other options of the Solver. Example: mode = 'lp', warm_start = True
+    # returns a list with (file, formulation, error, time) of every run, error is None if it finished
+    cores = os.cpu_count() or 1
+    threads = max(1, min(threads, cores))
+    workers = max(1, min(workers or cores, cores // threads))
+    memory_limit = memory / workers if memory is not None else None
+    names = [formulation if isinstance(formulation, str) else formulation.__name__ for formulation in formulations_list]
+
+    with ResultsStore(results) as store:
+        run_options = {option: options[option] for option in RUN_OPTIONS if option in options}
+        done = store.solved_runs(options.get('mode', 'lp_mip'), **run_options) if resume else set()
+    tasks = []
+    total = 0
+    for filename in instances:
+        for instance, problem_name in instances_of(filename):
+            for name in names:
+                total += 1
+                if (name, problem_name) not in done:
+                    tasks.append((instance, name, time_limit, username, dict(options, threads = threads, results = results)))
+    print(f'{len(tasks)} runs ({total - len(tasks)} already solved), {workers} workers x {threads} threads')
+
+    runs = []
+    with multiprocessing.Pool(workers, initializer = start_worker, initargs = (username, memory_limit)) as pool:
+        for run in pool.imap_unordered(solve_task, tasks):
+            runs.append(run)
+            filename, name, error, run_time = run
+            print(f'[{len(runs)}/{len(tasks)}] {name} {filename} {run_time:.2f}s' + (f' ERROR {error}' if error else ''))
+    return runs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Solves instances with formulations in parallel')
+    parser.add_argument('instances', nargs = '+', help = 'files of the instances in TSPLIB format or archives (.npy)')
+    parser.add_argument('--formulations', nargs = '+', default = ['DFJ', 'MTZ', 'Single_Commodity', 'Multi_Commodity', 'Log_Lex'])
+    parser.add_argument('--time-limit', type = float, default = 60 * 10)
+    parser.add_argument('--username', default = None)
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--threads', type = int, default = 1)
+    parser.add_argument('--memory', type = float, default = None, help = 'total memory in GB')
+    parser.add_argument('--results', default = 'results.db', help = 'results database')
+    parser.add_argument('--mode', default = 'lp_mip', choices = ['lp', 'lp_mip', 'mip'], help = 'problems solved (see Solver)')
+    parser.add_argument('--warm-start', action = 'store_true', help = 'starts from a heuristic tour')
+    parser.add_argument('--model-cache', default = None, help = 'folder of the model cache (see model_cache.py)')
+    parser.add_argument('--no-log', action = 'store_true', help = 'does not save the Gurobi log files')
+    parser.add_argument('--trajectory', type = float, default = None, help = 'seconds between samples of the trajectory (see trajectory.py)')
+    parser.add_argument('--candidates', default = None, type = lambda value: value if value == 'delaunay' else int(value),
+                        help = "k nearest neighbours (int) or 'delaunay' candidate arcs (see preprocessing.py)")
+    parser.add_argument('--fix-arcs', action = 'store_true', help = 'removes arcs by reduced cost fixing (see preprocessing.py)')
+    parser.add_argument('--profile', choices = ['cprofile', 'tracemalloc'], help = 'profiles formulation() (see instrumentation.py)')
+    parser.add_argument('--no-resume', action = 'store_true', help = 'solves again the runs already in the results database')
+    args = parser.parse_args()
+    run_batch(args.instances, args.formulations, args.time_limit, args.username, args.workers,
+              args.threads, args.memory, not args.no_resume, args.results, mode = args.mode, warm_start = args.warm_start,
+              profile = args.profile, cache = args.model_cache, log = not args.no_log, trajectory = args.trajectory,
+              candidates = args.candidates, fix_arcs = args.fix_arcs)
@@ -0,0 +1,80 @@
+# file that contains the separation routines of the sub-tour restrictions
+# used by the formulations that add them on the fly (DFJ_Lazy)
+
+import numpy as np
+
+def connected_components(weights, tolerance = 1e-6):
+    # returns the connected components of the support graph of a solution
+    # receives:
+    # (1) weights: symmetric matrix (n x n) with x[i, j] + x[j, i]
+    # (2) tolerance: arcs with a lower value are not considered
+    # returns a list of arrays with the positions (0 to n - 1) of each component
+    support = weights > tolerance
+    unvisited = np.ones(len(weights), dtype = bool)
+    components = []
+    while unvisited.any():
+        start = int(np.argmax(unvisited))
+        component = np.zeros(len(weights), dtype = bool)
+        component[start] = True
+        frontier = component.copy()
+        while frontier.any():
+            frontier = support[frontier].any(axis = 0) & ~component
+            component |= frontier
+        unvisited &= ~component
+        components.append(np.flatnonzero(component))
+    return components
+
+def minimum_cut(weights):
+    # Stoer-Wagner global minimum cut of a symmetric weight matrix (n x n)
+    # returns the value of the cut and a boolean mask with one side of the cut
+    weights = np.array(weights, dtype = float)
+    np.fill_diagonal(weights, 0)
+    n = len(weights)
+    groups = np.eye(n, dtype = bool) # groups[v]: original nodes merged into v
+    active = np.ones(n, dtype = bool)
+    best_value, best_side = np.inf, None
+    for _ in range(n - 1):
+        # maximum adjacency ordering of the active nodes
+        order = np.flatnonzero(active)
+        added = ~active
+        previous = last = order[0]
+        added[last] = True
+        connection = weights[last].copy()
+        cut_of_the_phase = 0
+        for _ in range(len(order) - 1):
+            previous = last
+            last = int(np.argmax(np.where(added, - np.inf, connection)))
+            added[last] = True
+            cut_of_the_phase = connection[last]
+            connection += weights[last]
+        if cut_of_the_phase < best_value:
+            best_value, best_side = cut_of_the_phase, groups[last].copy()
+        # merge the last two nodes of the ordering
+        weights[previous] += weights[last]
+        weights[:, previous] += weights[:, last]
+        weights[previous, previous] = 0
+        weights[last] = 0
+        weights[:, last] = 0
+        groups[previous] |= groups[last]
+        active[last] = False
+    return best_value, best_side
+
+def violated_subsets(weights, integral, tolerance = 1e-6):
+    # finds subsets S of nodes whose sub-tour restriction is violated
+    # receives:
+    # (1) weights: symmetric matrix (n x n) with x[i, j] + x[j, i]
+    # (2) integral: True if the solution is integer (only components are checked)
+    # (3) tolerance: minimum violation of the restriction
+    # returns a list of arrays with the positions (0 to n - 1) of each subset
+    components = connected_components(weights, tolerance)
+    if len(components) > 1:
+        return components
+    if integral or len(weights) < 3:
+        return []
+    # every subset S of a connected solution satisfies x(S, V \ S) >= 2
+    value, side = minimum_cut(weights)
+    if value < 2 - tolerance:
+        if side.sum() > len(side) / 2:
+            side = ~side
+        return [np.flatnonzero(side)]
+    return []
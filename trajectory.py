@@ -0,0 +1,89 @@
+# file that records how the incumbent and the best bound of a run change over time (trajectory)
+# The Solver samples them from a Gurobi callback (trajectory = interval in seconds) and saves one array
+# per run in the results database. Each row of the array is a sample: time, incumbent, bound, nodes, gap.
+# Example:
+#   MTZ(problem, 60 * 10, 'javieragebhardt', trajectory = 1).solve()
+#   for formulation, instance, nodes, samples in load_trajectories('results.db', nodes = 15):
+#       print(formulation, primal_dual_integral(samples, 60 * 10))
+
+import numpy as np
+from gurobipy import GRB
+from results_store import ResultsStore, CONFIGURATION, configuration_label
+
+SAMPLE = ['time', 'incumbent', 'bound', 'nodes', 'gap'] # columns of a trajectory
+
+def finite(value):
+    # values of GRB.INFINITY (no incumbent or bound found yet) as inf
+    return np.sign(value) * np.inf if abs(value) >= GRB.INFINITY else value
+
+class TrajectoryRecorder:
+    # Gurobi callback that samples the incumbent and the best bound of the original problem, receives:
+    #  (1) interval: seconds between two samples. A sample is also taken every time the incumbent
+    #      improves, so the primal-dual integral is exact between samples
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = []
+        self.last_time = - np.inf
+        self.last_incumbent = np.inf
+
+    def __call__(self, model, where):
+        if where != GRB.Callback.MIP:
+            return
+        runtime = model.cbGet(GRB.Callback.RUNTIME)
+        incumbent = finite(model.cbGet(GRB.Callback.MIP_OBJBST))
+        if runtime - self.last_time < self.interval and incumbent >= self.last_incumbent:
+            return
+        self.add(runtime, incumbent, model.cbGet(GRB.Callback.MIP_OBJBND), model.cbGet(GRB.Callback.MIP_NODCNT))
+
+    def add(self, runtime, incumbent, bound, nodes):
+        incumbent, bound = finite(incumbent), finite(bound)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            gap = abs(incumbent - bound) / abs(incumbent) if np.isfinite(incumbent) else np.inf
+        self.samples.append((runtime, incumbent, bound, nodes, gap))
+        self.last_time, self.last_incumbent = runtime, min(self.last_incumbent, incumbent)
+
+    def finish(self, model):
+        # adds the final state of the optimization
+        incumbent = model.ObjVal if model.SolCount > 0 else GRB.INFINITY
+        self.add(model.Runtime, incumbent, model.ObjBound, model.NodeCount)
+
+    def array(self):
+        # (samples x 5) array with the columns of SAMPLE
+        return np.array(self.samples, dtype = float).reshape(- 1, len(SAMPLE))
+
+def encode(samples):
+    # bytes saved in the results database
+    return np.ascontiguousarray(samples, dtype = '<f8').tobytes()
+
+def decode(data):
+    # array of samples saved with encode
+    return np.frombuffer(data, dtype = '<f8').reshape(- 1, len(SAMPLE))
+
+def load_trajectories(file_path = 'results.db', formulation = None, instance = None, nodes = None):
+    # returns a list of (formulation, instance, nodes, samples) with the runs of the results database
+    # that have a trajectory and match the filters (see ResultsStore.query). The formulation is followed
+    # by the options of the run that are not the default ones (see configuration_label)
+    with ResultsStore(file_path) as store:
+        rows = store.query(['formulation', 'instance', 'nodes', 'trajectory'] + list(CONFIGURATION), formulation, instance, nodes)
+    return [(configuration_label(formulation, *options), instance, nodes, decode(data))
+            for formulation, instance, nodes, data, *options in rows if data is not None]
+
+def primal_dual_gap(samples):
+    # primal-dual gap function of every sample: |incumbent - bound| / max(|incumbent|, |bound|),
+    # 1 if there is no incumbent or bound or they have different signs (between 0 and 1)
+    incumbent, bound = samples[:, 1], samples[:, 2]
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        gap = np.abs(incumbent - bound) / np.maximum(np.abs(incumbent), np.abs(bound))
+    gap = np.where(incumbent == bound, 0, gap)
+    return np.where(np.isfinite(incumbent) & np.isfinite(bound) & (np.sign(incumbent) * np.sign(bound) >= 0), gap, 1)
+
+def primal_dual_integral(samples, time_limit = None):
+    # integral over time of the primal-dual gap function (it holds its value until the next sample) from 0
+    # to time_limit (the end of the run if None). Lower is better: the run closes the gap faster
+    time = samples[:, 0]
+    end = time[- 1] if time_limit is None else time_limit
+    gap = primal_dual_gap(samples)
+    # the gap is 1 before the first sample and keeps the last value after the last one
+    limits = np.clip(np.concatenate(([0], time, [max(end, time[- 1])])), 0, end)
+    values = np.concatenate(([1], gap))
+    return float((np.diff(limits) * values).sum())